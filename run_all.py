@@ -1,22 +1,49 @@
-import os, glob
+import os, glob, sys, datetime as dt
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts"))
+import snapshot_store
+from snapshot_store import by_snapshot_day, snapshot_day
+from detect_changes import diff_and_write, merge_change_log, load
 
 def newest_two(pattern):
-    files = sorted(glob.glob(pattern), key=os.path.getmtime)
+    files = by_snapshot_day(glob.glob(pattern))
     if len(files) < 2:
         raise SystemExit("Need at least two snapshot files in data/")
     return files[-2], files[-1]
 
-print("1) Merging state files...")
-os.system("python scripts/merge_data.py")
+def detect_latest():
+    # Diffs the newest two snapshots and merges the rows into the cumulative
+    # change log, which /changes and the enrichment queue read.
+    history = snapshot_store.days()
+    if len(history) >= 2:
+        old, new = history[-2:]
+        print(f"2) Detecting changes between {old} and {new} (history) ...")
+        # Rebuild both days from base + deltas in-process.
+        old_df, new_df, day = snapshot_store.reconstruct(old), snapshot_store.reconstruct(new), new
+    else:
+        old, new = newest_two("data/snapshot_*.csv")
+        print(f"2) Detecting changes between {old} and {new} ...")
+        old_df, new_df, day = load(old), load(new), snapshot_day(new) or dt.date.today().isoformat()
+    return merge_change_log(diff_and_write(old_df, new_df, day), [day])
 
-old, new = newest_two("data/snapshot_*.csv")
-print(f"2) Detecting changes between {old} and {new} ...")
-os.system(f"python scripts/detect_changes.py --old {old} --new {new}")
+def main():
+    print("1) Merging state files...")
+    os.system("python scripts/merge_data.py")
 
-print("3) Enriching changed companies ...")
-os.system("python scripts/enrich_data.py")
+    print("   Resolving duplicate entities across state files...")
+    os.system("python scripts/resolve_entities.py")
 
-print("4) Generating AI summary ...")
-os.system("python scripts/ai_summary.py")
+    detect_latest()
 
-print("Done. Launch Streamlit with:\n    python -m streamlit run scripts/app_streamlit.py")
+    print("3) Enriching changed companies ...")
+    os.system("python scripts/enrich_data.py")
+
+    print("4) Generating AI summary ...")
+    os.system("python scripts/ai_summary.py")
+
+    print("5) Publishing Arrow tables for the API and dashboard ...")
+    os.system("python scripts/publish_data.py")
+
+    print("Done. Launch Streamlit with:\n    python -m streamlit run scripts/app_streamlit.py")
+
+if __name__ == "__main__":
+    main()
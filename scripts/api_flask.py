@@ -1,35 +1,249 @@
-from flask import Flask, request, jsonify
-import pandas as pd, os
+from flask import Flask, request, jsonify, Response
+import pandas as pd, numpy as np, os, json, time
+from detect_changes import FIELDS_TO_COMPARE, CHANGE_COLS
+from temporal_index import TemporalIndex
+from exporters import FORMATS, iter_export_frames
+import datastore
 
 app = Flask(__name__)
 
+FEED_TYPES = ["New_Incorporation","Removed","Field_Update"]
+CHUNK_ROWS = 5000
+EXPORT_BATCH_ROWS = 65_536
+SSE_POLL_SECONDS = 2.0
+SSE_KEEPALIVE_SECONDS = 15.0
+
 def load_master():
-    p = "outputs/master_current.csv"
-    return pd.read_csv(p, dtype=str, low_memory=False) if os.path.exists(p) else pd.DataFrame()
+    return datastore.get_table("master")
+
+def load_changes():
+    return datastore.get_table("changes")
+
+_temporal = {}
+
+def load_temporal_index():
+    v = datastore.version("changes")
+    if "index" not in _temporal or _temporal.get("version") != v:
+        _temporal.update(version=v, index=TemporalIndex.from_change_log(load_changes()))
+    return _temporal["index"]
+
+_fingerprints = {}
+
+def change_fingerprints(df):
+    # fp[k] identifies the first k rows of the log: per-row hashes mixed with
+    # their position and summed, so a rewrite that keeps the length (or moves
+    # rows) still changes the prefix a cursor was issued for. One vectorized
+    # pass per loaded log.
+    if _fingerprints.get("df") is not df:
+        t = df.reindex(columns=CHANGE_COLS).astype(object)
+        t = t.where(t.notna(), "")
+        rows = pd.util.hash_pandas_object(t, index=False).to_numpy(dtype=np.uint64, copy=True)
+        rows ^= np.arange(len(rows), dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        _fingerprints.update(df=df, fp=np.concatenate([[np.uint64(0)], np.cumsum(rows, dtype=np.uint64)]))
+    return _fingerprints["fp"]
+
+def read_changes_since(df, offset):
+    # Seq is the 0-based row position in the change log; Cursor is the token to
+    # resume after that row (`since=<Cursor>`, also the SSE event id). It
+    # carries the fingerprint of every row served so far, so a cursor issued
+    # before the log was rewritten is detected instead of skipping or
+    # repeating rows.
+    fp = change_fingerprints(df)
+    for start in range(offset, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS].reindex(columns=CHANGE_COLS).astype(object)
+        chunk = chunk.where(chunk.notna(), "")
+        for seq, rec in enumerate(chunk.to_dict(orient="records"), start):
+            rec["Seq"] = seq
+            rec["Cursor"] = f"{seq + 1}.{int(fp[seq + 1]):016x}"
+            yield rec
+
+def resolve_cursor(df, since):
+    # `since` is a Cursor token ("1200.<fingerprint>"), a bare row offset
+    # ("1200", not checked against rewrites), or a date with an optional
+    # sequence within that date ("2025-10-15" or "2025-10-15:40"). Returns
+    # (offset, reset); a token whose rows are no longer the log's prefix
+    # restarts from the top with reset set.
+    since = (since or "").strip()
+    if not since:
+        return 0, False
+    if since.isdigit():
+        return int(since), False
+    pos, dot, mark = since.partition(".")
+    if dot:
+        if not (pos.isdigit() and len(mark) == 16 and all(c in "0123456789abcdef" for c in mark)):
+            raise ValueError(f"Invalid cursor: {since}")
+        fp = change_fingerprints(df)
+        pos = int(pos)
+        if pos < len(fp) and f"{int(fp[pos]):016x}" == mark:
+            return pos, False
+        return 0, True
+    day, _, seq = since.partition(":")
+    day = pd.to_datetime(day, errors="coerce")
+    if pd.isna(day):
+        raise ValueError(f"Invalid cursor: {since}")
+    if df.empty or "Date" not in df.columns:
+        return 0, False
+    dates = pd.to_datetime(df["Date"], errors="coerce")
+    hits = (dates.dt.normalize() >= day.normalize()).to_numpy(dtype=bool, na_value=False).nonzero()[0]
+    if not len(hits):
+        return len(dates), False
+    start = int(hits[0])
+    return (start + int(seq) if seq.isdigit() else start), False
+
+def change_types_arg():
+    t = request.args.get("types")
+    if not t:
+        return set(FEED_TYPES)
+    return {x.strip() for x in t.split(",") if x.strip()}
+
+def sse_events(offset, types, reset=False):
+    # Polls the cheap version check and pushes rows appended since `offset`.
+    # A `reset` event tells the client its cursor no longer matched the log
+    # and the stream restarted from the top.
+    last_version, last_sent, df = None, time.monotonic(), load_changes()
+    mark = change_fingerprints(df)[min(offset, len(df))]
+    if reset:
+        yield "event: reset\ndata: {}\n\n"
+    while True:
+        v = datastore.version("changes")
+        if v != last_version:
+            last_version = v
+            df = load_changes()
+            fp = change_fingerprints(df)
+            if offset >= len(fp) or fp[offset] != mark:
+                # Change log was rewritten under the rows already sent.
+                offset = 0
+                yield "event: reset\ndata: {}\n\n"
+            for rec in read_changes_since(df, offset):
+                offset = rec["Seq"] + 1
+                if rec["Change_Type"] in types:
+                    yield f"id: {rec['Cursor']}\nevent: {rec['Change_Type']}\ndata: {json.dumps(rec)}\n\n"
+                    last_sent = time.monotonic()
+            mark = fp[offset]
+        if time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(SSE_POLL_SECONDS)
+
+FILTER_ARGS = ["q","state","status","year","sector","nic","as_of"]
+EXPORT_FORMATS = {"arrow": "Arrow IPC", "parquet": "Parquet"}
+
+def company_filters():
+    f = {k: request.args.get(k) for k in FILTER_ARGS}
+    f["q"] = (f["q"] or "").lower()
+    if f["as_of"] and pd.isna(pd.to_datetime(f["as_of"], errors="coerce")):
+        raise ValueError(f"Invalid as_of date: {f['as_of']}")
+    return f
+
+def filter_companies(df, f):
+    # Shared by /search_company (whole frame) and /export (one batch at a time);
+    # every step is row-local, so filtering batches gives the same rows.
+    if f["q"]:
+        cm = df["CIN"].str.lower().str.contains(f["q"], na=False)
+        nm = df["CompanyName"].str.lower().str.contains(f["q"], na=False)
+        df = df[cm | nm]
+    if f["state"]:
+        df = df[df.get("State","") == f["state"]]
+    if f["as_of"]:
+        df = load_temporal_index().resolve_frame(df, f["as_of"], FIELDS_TO_COMPARE)
+    if f["status"]:
+        df = df[df.get("Status","") == f["status"]]
+    if f["year"] and "Year" in df.columns:
+        df = df[df["Year"] == f["year"]]
+    elif f["year"] and "IncorporationDate" in df.columns:
+        y = pd.to_datetime(df["IncorporationDate"], errors="coerce").dt.year.astype("Int64").astype(str)
+        df = df[y == f["year"]]
+    if f["sector"]:
+        df = df[df.get("Sector","") == f["sector"]]
+    if f["nic"]:
+        # NIC codes are hierarchical, so a prefix selects a whole division or group.
+        df = df[df.get("NIC_Code", pd.Series("", index=df.index)).fillna("").str.startswith(f["nic"])]
+    return df
 
 @app.get("/search_company")
 def search_company():
     df = load_master()
     if df.empty:
         return jsonify([])
-    q = (request.args.get("q") or "").lower()
-    state = request.args.get("state")
-    status = request.args.get("status")
-    year = request.args.get("year")
-
-    if q:
-        cm = df["CIN"].str.lower().str.contains(q, na=False)
-        nm = df["CompanyName"].str.lower().str.contains(q, na=False)
-        df = df[cm | nm]
-    if state:
-        df = df[df.get("State","") == state]
-    if status:
-        df = df[df.get("Status","") == status]
-    if year and "IncorporationDate" in df.columns:
-        y = pd.to_datetime(df["IncorporationDate"], errors="coerce").dt.year.astype("Int64").astype(str)
-        df = df[y == year]
+    try:
+        f = company_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(filter_companies(df, f).head(500).to_dict(orient="records"))
+
+@app.get("/export")
+def export():
+    # Bulk pull with the /search_company filters. The master is walked in
+    # EXPORT_BATCH_ROWS slices (zero-copy views of the memory-mapped table);
+    # each slice is filtered and written as one Arrow record batch or Parquet
+    # row group, so memory stays flat however many rows match.
+    df = load_master()
+    try:
+        f = company_filters()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    fmt = EXPORT_FORMATS.get((request.args.get("format") or "arrow").lower())
+    if fmt is None:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    cols = [c.strip() for c in (request.args.get("columns") or "").split(",") if c.strip()] or list(df.columns)
+    missing = [c for c in cols if c not in df.columns]
+    if missing:
+        return jsonify({"error": f"Unknown columns: {', '.join(missing)}"}), 400
+
+    def frames():
+        yield df.iloc[:0][cols]
+        for start in range(0, len(df), EXPORT_BATCH_ROWS):
+            part = filter_companies(df.iloc[start:start + EXPORT_BATCH_ROWS], f)
+            if len(part):
+                yield part[cols]
+
+    ext, mime = FORMATS[fmt]
+    return Response(iter_export_frames(frames(), fmt), mimetype=mime,
+                    headers={"Content-Disposition": f"attachment; filename=companies{ext}",
+                             "X-Data-Version": str(datastore.current_version() or "")})
+
+@app.get("/version")
+def version():
+    # Lets clients poll one small document to learn whether data changed.
+    m = datastore.manifest()
+    return jsonify(m or {"version": None})
+
+@app.get("/ingest_status")
+def ingest_status():
+    p = "outputs/ingest_status.json"
+    if not os.path.exists(p):
+        return jsonify({"running": False})
+    with open(p) as f:
+        status = json.load(f)
+    # Lag keeps growing while the daemon is stuck, even if it stops reporting.
+    if status.get("queue_depth") or status.get("debouncing") or status.get("retrying"):
+        status["lag_seconds"] = round(status.get("lag_seconds", 0) + time.time() - status["updated_at"], 1)
+    status["age_seconds"] = round(time.time() - status["updated_at"], 1)
+    return jsonify(status)
+
+@app.get("/changes")
+def changes():
+    df = load_changes()
+    try:
+        last_id = request.headers.get("Last-Event-ID", "")
+        if not request.args.get("since") and last_id.isdigit():
+            offset, reset = int(last_id) + 1, False
+        else:
+            offset, reset = resolve_cursor(df, request.args.get("since") or last_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    types = change_types_arg()
+
+    if request.args.get("mode") == "sse":
+        return Response(sse_events(offset, types, reset), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-    return jsonify(df.head(500).to_dict(orient="records"))
+    def ndjson():
+        for rec in read_changes_since(df, offset):
+            if rec["Change_Type"] in types:
+                yield json.dumps(rec) + "\n"
+    return Response(ndjson(), mimetype="application/x-ndjson",
+                    headers={"X-Cursor-Reset": "1"} if reset else {})
 
 if __name__ == "__main__":
     app.run(port=8000, debug=True)
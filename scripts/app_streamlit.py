@@ -3,9 +3,14 @@
 
 import os
 import json
+from functools import partial
 import streamlit as st
 import pandas as pd
 import altair as alt
+from detect_changes import FIELDS_TO_COMPARE
+from temporal_index import TemporalIndex
+from exporters import FORMATS, export_file
+import datastore
 
 # Plotly is optional; app will fall back to Altair if missing
 try:
@@ -30,6 +35,10 @@ def read_csv_safe(path: str, dtypes=None) -> pd.DataFrame:
     except Exception:
         return pd.read_csv(path, dtype=str, low_memory=False)
 
+@st.cache_resource(show_spinner=False)
+def load_temporal_index(version) -> TemporalIndex:
+    return TemporalIndex.from_change_log(datastore.get_table("changes"))
+
 def ensure_cols(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
     df = df.copy()
     for c in cols:
@@ -38,7 +47,7 @@ def ensure_cols(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
     return df
 
 def add_year(df: pd.DataFrame) -> pd.DataFrame:
-    if "IncorporationDate" in df.columns:
+    if "IncorporationDate" in df.columns and "Year" not in df.columns:
         y = pd.to_datetime(df["IncorporationDate"], errors="coerce").dt.year.astype("Int64").astype(str)
         df = df.assign(Year=y)
     return df
@@ -63,6 +72,14 @@ def date_range_selector(series: pd.Series, label: str = "Date range"):
 def to_bytes_csv(df: pd.DataFrame) -> bytes:
     return df.to_csv(index=False).encode()
 
+def lazy_download(label: str, df: pd.DataFrame, base_name: str, key: str):
+    # The export runs only when the button is clicked, so reruns never
+    # serialize the filtered frame.
+    c1, c2 = st.columns([1, 3])
+    fmt = c1.selectbox("Format", list(FORMATS), key=f"{key}_fmt", label_visibility="collapsed")
+    ext, mime = FORMATS[fmt]
+    c2.download_button(label, partial(export_file, df, fmt), f"{base_name}{ext}", mime, key=key)
+
 def to_bytes_json(obj: dict) -> bytes:
     return json.dumps(obj, indent=2).encode("utf-8")
 
@@ -264,31 +281,33 @@ def show_company_timeline(hist: pd.DataFrame):
         st.altair_chart(chart, use_container_width=True)
 
 # ---------- Paths ----------
-MASTER_PATH = "outputs/master_current.csv"
-CHANGE_ALL_PATH = "outputs/daily_change_log_all.csv"
-CHANGE_PATH = CHANGE_ALL_PATH if os.path.exists(CHANGE_ALL_PATH) else "outputs/daily_change_log.csv"
-ENRICHED_PATH = "outputs/enriched_mca.csv"
 SUMMARY_TXT = "outputs/daily_summary.txt"
 SUMMARY_JSON = "outputs/daily_summary.json"
+VALIDATION_JSON = "outputs/validation_report.json"
 
 # ---------- Load ----------
-master = read_csv_safe(MASTER_PATH) if os.path.exists(MASTER_PATH) else read_csv_safe("data/snapshot_day3.csv")
+# Tables come from datastore's per-process cache: memory-mapped Arrow files when
+# publish_data.py has run, so all sessions and workers share one copy.
+master = datastore.get_table("master")
+if master.empty:
+    master = read_csv_safe("data/snapshot_day3.csv")
 master = ensure_cols(
     master,
     [
-        "CIN", "CompanyName", "State", "CompanyROCcode", "Status",
+        "CIN", "CompanyName", "State", "ROC", "Status",
         "AuthorizedCapital", "PaidUpCapital", "IncorporationDate",
         "CompanyCategory", "CompanySubCategory", "Class"
     ]
 )
 master = add_year(master)
 
-changes = read_csv_safe(CHANGE_PATH)
+changes = datastore.get_table("changes")
 changes = ensure_cols(changes, ["CIN", "Change_Type", "Field_Changed", "Old_Value", "New_Value", "Date"])
 if "Date" in changes.columns:
     changes["Date"] = pd.to_datetime(changes["Date"], errors="coerce")
 
-enriched = read_csv_safe(ENRICHED_PATH)
+enriched = datastore.get_table("enriched")
+clusters = datastore.get_table("clusters")
 
 # ---------- Session ----------
 if "bookmarks" not in st.session_state:
@@ -302,7 +321,12 @@ st.caption("Consolidate MCA master data, detect daily changes, enrich with publi
 
 left, mid, right = st.columns(3)
 with left:
-    st.metric("Companies in master", f"{len(master):,}")
+    if not clusters.empty and {"CIN", "ClusterID"} <= set(clusters.columns):
+        n_entities = clusters.loc[clusters["CIN"].isin(master["CIN"]), "ClusterID"].nunique()
+        st.metric("Companies in master", f"{n_entities:,}",
+                  help=f"{len(master):,} rows resolved to distinct entities")
+    else:
+        st.metric("Companies in master", f"{len(master):,}")
 states_all = sorted([s for s in master["State"].dropna().unique().tolist() if s])
 with mid:
     st.metric("States covered", len(states_all))
@@ -340,11 +364,17 @@ with t_over:
             st.json(pd.read_json(SUMMARY_JSON).to_dict())
         else:
             st.info("Run ai_summary.py to generate daily summary.")
+        if os.path.exists(VALIDATION_JSON):
+            rep = json.load(open(VALIDATION_JSON, "r", encoding="utf-8"))
+            with st.expander(f"Data quality: {rep['rows_quarantined']:,} of {rep['rows_in']:,} rows quarantined"):
+                rules = pd.DataFrame([{"Rule": k, "Rows": v["count"], "Check": v["description"]}
+                                      for k, v in rep["rules"].items()])
+                st.dataframe(rules, width="stretch", hide_index=True)
+                st.caption("Rejected rows with reason codes: outputs/quarantine.csv")
 
     st.markdown("—")
-    base_state_col = "CompanyROCcode" if "CompanyROCcode" in master.columns else "State"
     chart_type = st.radio("Choose chart style", ["Treemap", "Bar", "Donut"], index=0, horizontal=True)
-    show_top_states_chart(master, base_state_col, chart_type)
+    show_top_states_chart(master, "State", chart_type)
 
 # ---------- Company panel (with visuals) ----------
 def company_panel(cin: str):
@@ -357,9 +387,17 @@ def company_panel(cin: str):
         st.warning("Company not found in master.")
         return
 
+    as_of = st.date_input("As of date", value=None, key=f"asof_{cin}",
+                          help="Show Status, capital and Class as recorded on this date")
+    if as_of:
+        row = load_temporal_index(datastore.version("changes")).resolve_row(row, as_of, FIELDS_TO_COMPARE)
+        if not row:
+            st.warning(f"{cin} was not registered on {as_of.isoformat()}.")
+            return
+
     with st.container(border=True):
         st.subheader(f"{row.get('CompanyName', '—')}")
-        st.caption(f"CIN: {cin}")
+        st.caption(f"CIN: {cin}" + (f" · as of {as_of.isoformat()}" if as_of else ""))
 
         a, b, c = st.columns(3)
         a.metric("State", row.get("State", "—"))
@@ -418,14 +456,17 @@ with t_browse:
     state_opt = ["All"] + states_all
     status_opt = sorted([s for s in master["Status"].dropna().unique().tolist() if s])
     year_opt = ["All"] + sorted([y for y in master.get("Year", pd.Series()).dropna().unique().tolist() if y and y != "<NA>"])
+    sector_opt = ["All"] + sorted([s for s in master.get("Sector", pd.Series()).dropna().unique().tolist() if s])
 
-    a, b, c, d = st.columns(4)
+    a, b, c, e, d = st.columns(5)
     with a:
         state_sel = st.selectbox("State", state_opt)
     with b:
         status_sel = st.multiselect("Status", status_opt)
     with c:
         year_sel = st.selectbox("Year", year_opt)
+    with e:
+        sector_sel = st.selectbox("Sector (NIC)", sector_opt)
     with d:
         page_size = st.selectbox("Rows per page", [50, 100, 200, 500], index=1)
         page = st.number_input("Page", min_value=1, value=1, step=1)
@@ -443,17 +484,20 @@ with t_browse:
         df = df[df["Status"].isin(status_sel)]
     if year_sel != "All" and "Year" in df.columns:
         df = df[df["Year"] == year_sel]
+    if sector_sel != "All":
+        df = df[df["Sector"] == sector_sel]
 
     st.caption(f"Showing {min(len(df), page_size)} of {len(df):,} (page {page})")
     st.dataframe(paginate(df, page, page_size), width="stretch")
-    st.download_button("Download filtered CSV", to_bytes_csv(df), "filtered_master.csv", "text/csv")
+    lazy_download("Download filtered", df, "filtered_master", "dl_master")
 
     st.markdown("—")
     st.subheader("Company picker")
-    slim = df[["CIN", "CompanyName"]].dropna().head(1000).reset_index(drop=True)
+    pick = (df["CIN"].notna() & df["CompanyName"].notna()).to_numpy().nonzero()[0][:1000]
+    slim = df[["CIN", "CompanyName"]].iloc[pick]
     if not slim.empty:
         opts = slim["CIN"].tolist()
-        labels = {row["CIN"]: f'{row["CIN"]} — {row["CompanyName"]}' for _, row in slim.iterrows()}
+        labels = dict(zip(opts, (slim["CIN"] + " — " + slim["CompanyName"]).tolist()))
         if st.session_state.selected_cin in opts:
             default_idx = int(opts.index(st.session_state.selected_cin))
         else:
@@ -499,7 +543,7 @@ with t_changes:
 
         st.caption(f"Showing {min(len(ch), page_size_c)} of {len(ch):,} (page {page_c})")
         st.dataframe(paginate(ch, page_c, page_size_c), width="stretch")
-        st.download_button("Download change log CSV", to_bytes_csv(ch), "changes_filtered.csv", "text/csv")
+        lazy_download("Download change log", ch, "changes_filtered", "dl_changes")
 
         st.markdown("—")
         st.subheader("Changes by state")
@@ -530,7 +574,7 @@ with t_enr:
         e_ps = st.selectbox("Rows per page", [50, 100, 200, 500], index=0, key="enr_ps")
         e_pg = st.number_input("Page", min_value=1, value=1, step=1, key="enr_pg")
         st.dataframe(paginate(enriched, e_pg, e_ps), width="stretch")
-        st.download_button("Download enriched CSV", to_bytes_csv(enriched), "enriched_mca.csv", "text/csv")
+        lazy_download("Download enriched", enriched, "enriched_mca", "dl_enriched")
 
 # ================= CHAT (rule-based) =================
 with t_chat:
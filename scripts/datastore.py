@@ -0,0 +1,96 @@
+import pandas as pd, os, json
+
+# Shared read path for the API and the dashboard. publish_data.py writes each
+# pipeline run into outputs/versions/<id>/ and then atomically repoints
+# outputs/CURRENT at it, so readers never see a half-written run. Tables in
+# the current version are memory-mapped Arrow IPC files wrapped without
+# copying, so every process on the box shares the same page-cache pages.
+# Before anything has been published the CSV outputs are parsed as before.
+
+OUTPUTS = "outputs"
+VERSIONS_DIR = os.path.join(OUTPUTS, "versions")
+CURRENT = os.path.join(OUTPUTS, "CURRENT")
+CSV_SOURCES = {
+    "master": ["outputs/master_current.csv"],
+    "changes": ["outputs/daily_change_log_all.csv", "outputs/daily_change_log.csv"],
+    "enriched": ["outputs/enriched_mca.csv"],
+    "clusters": ["outputs/entity_clusters.csv"],
+}
+
+_cache = {}
+_current = {"stat": None, "id": None}
+
+def current_version():
+    # The single cheap check: one stat() of the pointer file, re-read only
+    # when it has been replaced.
+    try:
+        st = os.stat(CURRENT)
+    except OSError:
+        return None
+    sig = (st.st_mtime_ns, st.st_size, st.st_ino)
+    if _current["stat"] != sig:
+        with open(CURRENT) as f:
+            _current.update(stat=sig, id=f.read().strip() or None)
+    return _current["id"]
+
+def version_dir(vid=None):
+    vid = vid or current_version()
+    return os.path.join(VERSIONS_DIR, vid) if vid else None
+
+def manifest(vid=None):
+    d = version_dir(vid)
+    if d is None or not os.path.exists(os.path.join(d, "manifest.json")):
+        return {}
+    with open(os.path.join(d, "manifest.json")) as f:
+        return json.load(f)
+
+def csv_path(name):
+    for p in CSV_SOURCES.get(name, []):
+        if os.path.exists(p) and os.path.getsize(p) > 0:
+            return p
+    return None
+
+def source(name):
+    d = version_dir()
+    if d is not None:
+        p = os.path.join(d, f"{name}.arrow")
+        return p if os.path.exists(p) else None
+    return csv_path(name)
+
+def version(name):
+    vid = current_version()
+    if vid is not None:
+        return ("version", vid)
+    p = csv_path(name)
+    if p is None:
+        return None
+    st = os.stat(p)
+    return (p, st.st_mtime_ns, st.st_size)
+
+def read_arrow(path):
+    import pyarrow as pa
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+def load_table(name):
+    p = source(name)
+    if p is None:
+        return pd.DataFrame()
+    if p.endswith(".arrow"):
+        return read_arrow(p)
+    return pd.read_csv(p, dtype=str, low_memory=False)
+
+def get_table(name):
+    v = version(name)
+    hit = _cache.get(name)
+    if hit is None or hit[0] != v:
+        hit = (v, load_table(name))
+        _cache[name] = hit
+    return hit[1]
+
+def write_csv_atomic(df, path):
+    # Readers either see the previous file or the complete new one.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp-{os.getpid()}"
+    df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
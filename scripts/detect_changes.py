@@ -1,11 +1,16 @@
 import pandas as pd, os, argparse, datetime as dt
+from datastore import write_csv_atomic
 
 FIELDS_TO_COMPARE = ["Status","AuthorizedCapital","PaidUpCapital","Class"]
+CHANGE_COLS = ["CIN","Change_Type","Field_Changed","Old_Value","New_Value","Date"]
+MASTER_PATH = "outputs/master_current.csv"
+CHANGE_ALL = "outputs/daily_change_log_all.csv"
 
 def load(p):
     return pd.read_csv(p, dtype=str, low_memory=False)
 
-def detect_changes(old_df, new_df):
+def detect_changes(old_df, new_df, day=None):
+    day = day or dt.date.today().isoformat()
     merged = old_df.merge(new_df, on="CIN", how="outer", suffixes=("_old","_new"), indicator=True)
     new_incorp = merged[merged["_merge"]=="right_only"]["CIN"].tolist()
     removed = merged[merged["_merge"]=="left_only"]["CIN"].tolist()
@@ -24,33 +29,51 @@ def detect_changes(old_df, new_df):
                     "Field_Changed": field,
                     "Old_Value": ov,
                     "New_Value": nv,
-                    "Date": dt.date.today().isoformat()
+                    "Date": day
                 })
-    logs = [{"CIN":c,"Change_Type":"New_Incorporation","Field_Changed":"","Old_Value":"","New_Value":"","Date":dt.date.today().isoformat()} for c in new_incorp]
-    logs += [{"CIN":c,"Change_Type":"Removed","Field_Changed":"","Old_Value":"","New_Value":"","Date":dt.date.today().isoformat()} for c in removed]
+    logs = [{"CIN":c,"Change_Type":"New_Incorporation","Field_Changed":"","Old_Value":"","New_Value":"","Date":day} for c in new_incorp]
+    logs += [{"CIN":c,"Change_Type":"Removed","Field_Changed":"","Old_Value":"","New_Value":"","Date":day} for c in removed]
     logs += changes
     return pd.DataFrame(logs)
 
+def diff_and_write(old_df, new_df, day=None, out="outputs/daily_change_log.csv", master=True):
+    # Shared by this CLI, run_all, run_three_day and the ingest daemon: writes
+    # the log with the CHANGE_COLS layout (header only when nothing changed)
+    # and, unless master is False, the new snapshot as the current master.
+    log = detect_changes(old_df, new_df, day)
+    log = pd.DataFrame(columns=CHANGE_COLS) if log.empty else log.reindex(columns=CHANGE_COLS)
+    write_csv_atomic(log, out)
+    if master:
+        write_csv_atomic(new_df.drop_duplicates(subset=["CIN"]), MASTER_PATH)
+    return log
+
+def merge_change_log(log, days, path=CHANGE_ALL):
+    # Rows already logged for `days` are replaced and the log is kept in date
+    # order (stable, so a day's rows keep their order). Days newer than
+    # everything logged land at the end, so in-order runs only ever extend the
+    # file and /changes cursors stay valid; the file is replaced atomically.
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        old = pd.read_csv(path, dtype=str, low_memory=False).reindex(columns=CHANGE_COLS)
+        old = old[~old["Date"].isin(days)]
+    else:
+        old = pd.DataFrame(columns=CHANGE_COLS)
+    out = pd.concat([old, log.reindex(columns=CHANGE_COLS)], ignore_index=True) if len(log) else old
+    out = out.sort_values("Date", kind="stable", key=lambda d: d.fillna(""))
+    write_csv_atomic(out, path)
+    return out
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--old", required=True)
     ap.add_argument("--new", required=True)
     ap.add_argument("--out", default="outputs/daily_change_log.csv")
+    ap.add_argument("--date", help="date to stamp on the log (default: today)")
     args = ap.parse_args()
 
     old_df = load(args.old)
     new_df = load(args.new)
 
-    os.makedirs("outputs", exist_ok=True)
-    change_log = detect_changes(old_df, new_df)
-    cols = ["CIN","Change_Type","Field_Changed","Old_Value","New_Value","Date"]
-    if change_log.empty:
-        change_log = pd.DataFrame(columns=cols)
-    else:
-        change_log = change_log.reindex(columns=cols)
-    change_log.to_csv(args.out, index=False)
-
-    new_df.drop_duplicates(subset=["CIN"]).to_csv("outputs/master_current.csv", index=False)
+    diff_and_write(old_df, new_df, args.date, args.out)
 
 if __name__ == "__main__":
     main()
@@ -1,4 +1,8 @@
-import pandas as pd, os, random
+import pandas as pd, os, random, argparse
+from enrichment_queue import EnrichmentQueue
+from datastore import write_csv_atomic
+
+ENRICHED_PATH = "outputs/enriched_mca.csv"
 
 SOURCES = [
     ("ZaubaCorp","https://www.zaubacorp.com/company/{cin}"),
@@ -7,8 +11,11 @@ SOURCES = [
     ("MCA21","https://www.mca.gov.in/")
 ]
 
-def mock(row):
-    s = random.choice(SOURCES)
+# CINs each source may take per run; whatever does not fit waits in the queue.
+SOURCE_BUDGETS = {"ZaubaCorp": 40, "API Setu": 40, "GST Portal": 20, "MCA21": 20}
+
+def mock(row, source=None):
+    s = next((x for x in SOURCES if x[0] == source), None) or random.choice(SOURCES)
     return pd.Series({
         "CIN": row.get("CIN",""),
         "COMPANY_NAME": row.get("CompanyName",""),
@@ -19,19 +26,57 @@ def mock(row):
         "SOURCE_URL": s[1].format(cin=row.get("CIN",""))
     })
 
+def assign_sources(entries, budgets):
+    # Interleave sources so the highest-priority CINs are spread across them
+    # and no source is handed more than its budget.
+    slots = [src for i in range(max(budgets.values(), default=0)) for src, n in budgets.items() if i < n]
+    return list(zip(entries, slots))
+
+def parse_budgets(items):
+    budgets = dict(SOURCE_BUDGETS)
+    for item in items or []:
+        name, _, n = item.rpartition("=")
+        if name not in budgets or not n.isdigit():
+            raise SystemExit(f"--budget expects SOURCE=N with SOURCE one of: {', '.join(budgets)}")
+        budgets[name] = int(n)
+    return budgets
+
 def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget", action="append", metavar="SOURCE=N", help="override one source's per-run budget")
+    args = ap.parse_args()
+    budgets = parse_budgets(args.budget)
+
     os.makedirs("outputs", exist_ok=True)
     if os.path.exists("outputs/master_current.csv"):
         df = pd.read_csv("outputs/master_current.csv", dtype=str, low_memory=False)
     else:
         df = pd.read_csv("data/snapshot_day3.csv", dtype=str, low_memory=False)
-    if os.path.exists("outputs/daily_change_log.csv"):
-        changed = pd.read_csv("outputs/daily_change_log.csv", dtype=str)["CIN"].unique().tolist()
-        df = df[df["CIN"].isin(changed)]
-    if os.path.exists("outputs/enriched_mca.csv") and os.path.getsize("outputs/enriched_mca.csv") > 0:
-        return
-    enr = df.apply(mock, axis=1)
-    enr.to_csv("outputs/enriched_mca.csv", index=False)
+    enriched = pd.DataFrame()
+    if os.path.exists(ENRICHED_PATH) and os.path.getsize(ENRICHED_PATH) > 0:
+        enriched = pd.read_csv(ENRICHED_PATH, dtype=str, low_memory=False)
+
+    q = EnrichmentQueue.load()
+    added = q.sync(df, enriched)
+    work = assign_sources(q.pop(sum(budgets.values())), budgets)
+    rows = df.drop_duplicates("CIN").set_index("CIN", drop=False)
+    now = pd.Timestamp.now().isoformat(timespec="seconds")
+    out, failed = [], 0
+    for e, src in work:
+        try:
+            row = rows.loc[e["CIN"]] if e["CIN"] in rows.index else pd.Series({"CIN": e["CIN"]})
+            out.append(mock(row, src).to_dict() | {"CHANGE_TYPE": e["Change_Type"], "ENRICHED_AT": now})
+        except Exception as ex:
+            print(f"[enrich] {e['CIN']} via {src} failed: {ex}")
+            q.requeue(e)
+            failed += 1
+    if out:
+        fresh = pd.DataFrame(out)
+        if not enriched.empty:
+            enriched = enriched[~enriched["CIN"].isin(fresh["CIN"])]
+        write_csv_atomic(pd.concat([enriched, fresh], ignore_index=True), ENRICHED_PATH)
+    q.save()
+    print(f"Enriched {len(out):,} CINs ({failed} requeued); {added:,} newly queued, {len(q):,} waiting")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,208 @@
+import pandas as pd, numpy as np, os, io, json, heapq, hashlib, math, argparse
+import datastore
+
+# Persistent priority queue of CINs waiting for enrichment. Each run parses
+# only the change-log bytes appended since the last run (the cursor counts rows,
+# the same offsets /changes uses as Seq) and pushes them onto a binary heap, so
+# taking the next k CINs costs O(k log n) instead of re-sorting the whole log.
+# Whatever a run does not get to stays queued for the next one. A log that was
+# rewritten rather than appended to (run_three_day rebuilds it) no longer
+# hashes the same over the bytes already read, and is re-read from the top.
+#
+# Scores live in log space and use the change date itself rather than its
+# age, so entries pushed on different days still compare correctly:
+#   ln(type weight) + ln2 * date / HALF_LIFE_DAYS
+#   + CAPITAL_WEIGHT * log10(1 + authorized capital)
+#   + STALE_WEIGHT * min(days since last enrichment / REFRESH_DAYS, 1)
+#
+# A CIN pushed again replaces its earlier entry; superseded heap entries are
+# skipped on pop and dropped when they outnumber live ones.
+
+QUEUE_FILE = "outputs/enrichment_queue.parquet"
+STATE_FILE = "outputs/enrichment_queue.json"
+
+TYPE_WEIGHT = {"New_Incorporation": 4.0, "Field_Update": 2.0, "Removed": 1.0, "Refresh": 0.5}
+HALF_LIFE_DAYS = 7.0
+CAPITAL_WEIGHT = 0.25
+STALE_WEIGHT = 1.0
+REFRESH_DAYS = 90
+RETRY_PENALTY = math.log(2)
+ENTRY_COLS = ["key", "seq", "CIN", "Change_Type", "Date", "attempts"]
+
+def scores(change_types, dates, capital, stale_days):
+    # Vectorized over aligned Series; missing capital counts as 0 and a CIN
+    # never enriched counts as fully stale.
+    days = (pd.to_datetime(dates, errors="coerce") - pd.Timestamp("1970-01-01")).dt.days.fillna(0)
+    weight = change_types.map(TYPE_WEIGHT).fillna(1.0).astype(float)
+    stale = (stale_days.astype(float).clip(lower=0) / REFRESH_DAYS).clip(upper=1).fillna(1.0)
+    return (np.log(weight) + math.log(2) * days.astype(float) / HALF_LIFE_DAYS
+            + CAPITAL_WEIGHT * np.log10(1 + capital.astype(float).fillna(0).clip(lower=0))
+            + STALE_WEIGHT * stale)
+
+class EnrichmentQueue:
+    def __init__(self, heap=None, cursor=0, seq=0, log=None):
+        self.heap = heap or []        # (-score, seq, CIN, Change_Type, Date, attempts)
+        self.cursor, self.seq = cursor, seq
+        self.log = log or {}          # path, [mtime_ns, size], bytes read and their sha1 for the log last synced
+        self.live = {}                # CIN -> (seq, heap key) of its current entry
+        for e in self.heap:
+            if e[1] >= self.live.get(e[2], (-1,))[0]:
+                self.live[e[2]] = (e[1], e[0])
+
+    @classmethod
+    def load(cls):
+        # The heap is saved in array order, so it is still a valid heap on load.
+        state = {}
+        if os.path.exists(STATE_FILE):
+            with open(STATE_FILE) as f:
+                state = json.load(f)
+        heap = []
+        if os.path.exists(QUEUE_FILE):
+            t = pd.read_parquet(QUEUE_FILE)
+            heap = list(zip(t["key"].tolist(), t["seq"].tolist(), t["CIN"].tolist(),
+                            t["Change_Type"].tolist(), t["Date"].tolist(), t["attempts"].tolist()))
+        return cls(heap, state.get("cursor", 0), state.get("seq", 0), state.get("log"))
+
+    def save(self):
+        if len(self.heap) > 2 * len(self.live) + 1024:
+            self.heap = [e for e in self.heap if self._current(e)]
+            heapq.heapify(self.heap)
+        os.makedirs(os.path.dirname(QUEUE_FILE), exist_ok=True)
+        tmp = QUEUE_FILE + ".tmp"
+        pd.DataFrame(self.heap, columns=ENTRY_COLS).astype({"CIN": str, "Change_Type": str, "Date": str}).to_parquet(tmp, index=False)
+        os.replace(tmp, QUEUE_FILE)
+        tmp = STATE_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"cursor": self.cursor, "seq": self.seq, "log": self.log, "queued": len(self)}, f, indent=2)
+        os.replace(tmp, STATE_FILE)
+
+    def __len__(self):
+        return len(self.live)
+
+    def _current(self, e):
+        return self.live.get(e[2], (None,))[0] == e[1]
+
+    def push(self, cin, change_type, date, key, attempts=0):
+        # A CIN already queued at an equal or higher priority keeps its entry.
+        cur = self.live.get(cin)
+        if cur is not None and attempts == 0 and cur[1] <= -key:
+            return False
+        self.seq += 1
+        heapq.heappush(self.heap, (-key, self.seq, cin, change_type, date, attempts))
+        self.live[cin] = (self.seq, -key)
+        return True
+
+    def pop(self, k):
+        out = []
+        while self.heap and len(out) < k:
+            e = heapq.heappop(self.heap)
+            if not self._current(e):
+                continue
+            del self.live[e[2]]
+            out.append(dict(zip(ENTRY_COLS, e)))
+        return out
+
+    def peek(self, k):
+        # nsmallest over the raw heap may hit superseded entries, so widen the
+        # window until k live ones are found.
+        n = k
+        while True:
+            top = [e for e in heapq.nsmallest(n, self.heap) if self._current(e)]
+            if len(top) >= k or n >= len(self.heap):
+                return [dict(zip(ENTRY_COLS, e)) for e in top[:k]]
+            n *= 2
+
+    def requeue(self, entry):
+        # Failed work goes back with a lower priority per attempt.
+        key = -entry["key"] - RETRY_PENALTY
+        self.push(entry["CIN"], entry["Change_Type"], entry["Date"], key, entry["attempts"] + 1)
+
+    def read_new_changes(self):
+        empty = pd.DataFrame(columns=["CIN","Change_Type","Date"])
+        path = datastore.csv_path("changes")
+        if path is None:
+            return empty
+        st = os.stat(path)
+        sig = [st.st_mtime_ns, st.st_size]
+        same = self.log.get("path") == path
+        if same and self.log.get("sig") == sig:
+            return empty
+        done = self.log.get("bytes", 0) if same else 0
+        with open(path, "rb") as f:
+            header = f.readline()
+            h = hashlib.sha1()
+            if 0 < done <= st.st_size:
+                f.seek(0)
+                left = done
+                while left:
+                    block = f.read(min(left, 1 << 20))
+                    h.update(block)
+                    left -= len(block)
+            if done == 0 or done > st.st_size or h.hexdigest() != self.log.get("sha1"):
+                # Not an append to what was read before: start over.
+                done, self.cursor, h = len(header), 0, hashlib.sha1(header)
+            f.seek(done)
+            body = f.read()
+        body = body[:body.rfind(b"\n") + 1]      # a row still being written waits for the next run
+        h.update(body)
+        self.log = {"path": path, "sig": sig, "bytes": done + len(body), "sha1": h.hexdigest()}
+        if not body.strip():
+            return empty
+        new = pd.read_csv(io.BytesIO(header + body), dtype=str, low_memory=False)
+        self.cursor += len(new)
+        return new.dropna(subset=["CIN"])
+
+    def sync(self, master, enriched):
+        # Pushes change-log rows not seen by earlier syncs, plus companies
+        # whose enrichment is older than REFRESH_DAYS.
+        new = self.read_new_changes()
+
+        capital = (pd.to_numeric(master.set_index("CIN")["AuthorizedCapital"], errors="coerce")
+                   if {"CIN","AuthorizedCapital"} <= set(master.columns) else pd.Series(dtype=float))
+        capital = capital[~capital.index.duplicated()]
+        today = pd.Timestamp.now().normalize()
+        last = pd.Series(dtype="datetime64[ns]")
+        if {"CIN","ENRICHED_AT"} <= set(enriched.columns):
+            last = pd.to_datetime(enriched.set_index("CIN")["ENRICHED_AT"], errors="coerce")
+            last = last[~last.index.duplicated(keep="last")]
+        stale = (today - last).dt.days
+        # A rewritten log is re-read from the top; rows dated no later than the
+        # CIN's last enrichment were already handled.
+        dates = pd.to_datetime(new.get("Date", pd.Series("", index=new.index)), errors="coerce")
+        new = new[~(dates.to_numpy() <= last.reindex(new["CIN"]).to_numpy())]
+
+        # Due refreshes join the new change rows; scoring is one vectorized
+        # pass and only the best row per CIN reaches the heap.
+        due = stale[stale >= REFRESH_DAYS]
+        due = due[~due.index.isin(list(self.live))]
+        cand = pd.concat([
+            pd.DataFrame({"CIN": new["CIN"], "Change_Type": new["Change_Type"].fillna(""),
+                          "Date": new.get("Date", pd.Series("", index=new.index)).fillna("")}),
+            pd.DataFrame({"CIN": due.index, "Change_Type": "Refresh", "Date": str(today.date())}),
+        ], ignore_index=True)
+        if cand.empty:
+            return 0
+        cand["key"] = scores(cand["Change_Type"], cand["Date"],
+                             cand["CIN"].map(capital), cand["CIN"].map(stale)).to_numpy()
+        cand = cand.sort_values("key", ascending=False, kind="stable").drop_duplicates("CIN")
+        rows = zip(cand["CIN"].tolist(), cand["Change_Type"].tolist(), cand["Date"].tolist(), cand["key"].tolist())
+        if not self.heap:
+            # First fill (or a drained queue): one O(n) heapify instead of n pushes.
+            self.heap = [(-key, self.seq + i, cin, ctype, date, 0) for i, (cin, ctype, date, key) in enumerate(rows, 1)]
+            self.seq += len(self.heap)
+            self.live = {e[2]: (e[1], e[0]) for e in self.heap}
+            heapq.heapify(self.heap)
+            return len(self.heap)
+        return sum(self.push(cin, ctype, date, key) for cin, ctype, date, key in rows)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--top", type=int, default=20, help="show the next N CINs without popping them")
+    args = ap.parse_args()
+    q = EnrichmentQueue.load()
+    print(f"{len(q):,} CINs queued, change-log cursor at row {q.cursor:,}")
+    for e in q.peek(args.top):
+        print(f"{-e['key']:10.3f}  {e['CIN']}  {e['Change_Type']:<18} {e['Date']}  attempts={e['attempts']}")
+
+if __name__ == "__main__":
+    main()
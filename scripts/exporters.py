@@ -0,0 +1,115 @@
+import io, itertools
+
+# Chunked exporters shared by the dashboard and the API. Frames are encoded a
+# slice at a time: iter_export yields each encoded chunk as soon as it is ready,
+# export_file collects them into one buffer for callers that need a file.
+# iter_export_frames does the same for a stream of frames that is produced
+# lazily (e.g. filtered batch by batch), so the full result never exists at once.
+
+CHUNK_ROWS = 50_000
+
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "JSON lines": (".jsonl", "application/x-ndjson"),
+    "Arrow IPC": (".arrows", "application/vnd.apache.arrow.stream"),
+}
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only sink that hands back whatever has been written since the last
+    # drain(); lets pyarrow writers stream into a generator.
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._buf += b
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        out = bytes(self._buf)
+        self._buf.clear()
+        return out
+
+def _slices(df, chunk_rows):
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+# Writers take the frames to encode; the first frame fixes the columns and
+# may have zero rows.
+
+def _iter_csv(frames):
+    for i, part in enumerate(frames):
+        yield part.to_csv(index=False, header=i == 0).encode("utf-8")
+
+def _iter_jsonl(frames):
+    for part in frames:
+        if len(part):
+            yield part.to_json(orient="records", lines=True, force_ascii=False).rstrip("\n").encode("utf-8") + b"\n"
+
+def _arrow_batches(frames):
+    # An empty or all-None object column infers Arrow's null type, which later
+    # batches cannot be cast to, so the schema comes from the first frame with
+    # rows and any column still typed null is written as string.
+    import pyarrow as pa
+    frames = iter(frames)
+    held = []
+    for part in frames:
+        held.append(part)
+        if len(part):
+            break
+    schema = pa.Schema.from_pandas(held[-1], preserve_index=False)
+    schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in schema],
+                       metadata=schema.metadata)
+    def batches():
+        for part in itertools.chain(held, frames):
+            if len(part):
+                yield pa.RecordBatch.from_pandas(part, schema=schema, preserve_index=False)
+    return schema, batches()
+
+def _iter_parquet(frames):
+    import pyarrow as pa, pyarrow.parquet as pq
+    schema, batches = _arrow_batches(frames)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_batches([batch]))   # one row group per batch
+            yield sink.drain()
+    yield sink.drain()
+
+def _iter_arrow(frames):
+    import pyarrow as pa
+    schema, batches = _arrow_batches(frames)
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        yield sink.drain()
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+_WRITERS = {"CSV": _iter_csv, "Parquet": _iter_parquet, "JSON lines": _iter_jsonl, "Arrow IPC": _iter_arrow}
+
+def iter_export_frames(frames, fmt):
+    if fmt not in _WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    for chunk in _WRITERS[fmt](frames):
+        if chunk:
+            yield chunk
+
+def iter_export(df, fmt, chunk_rows=CHUNK_ROWS):
+    return iter_export_frames(itertools.chain([df.iloc[:0]], _slices(df, chunk_rows)), fmt)
+
+def export_file(df, fmt, chunk_rows=CHUNK_ROWS):
+    f = io.BytesIO()
+    for chunk in iter_export(df, fmt, chunk_rows):
+        f.write(chunk)
+    f.seek(0)
+    return f
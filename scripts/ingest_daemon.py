@@ -0,0 +1,231 @@
+import pandas as pd, os, glob, json, time, argparse, subprocess, sys, hashlib
+from collections import deque
+from detect_changes import CHANGE_COLS, detect_changes, diff_and_write, merge_change_log, load
+import snapshot_store
+
+# Long-running ingest: polls data/states/ and data/snapshot_*.csv, waits for a
+# quiet period so half-copied files and bursts settle, then runs only the
+# stages a change needs. Queue depth and lag are written to
+# outputs/ingest_status.json (served by the API at /ingest_status).
+
+STATE_GLOBS = [os.path.join("data", "states", f"*{ext}") for ext in (".csv", ".xlsx", ".xls")]
+SNAPSHOT_GLOB = os.path.join("data", "snapshot_*.csv")
+STATE_FILE = "outputs/ingest_state.json"
+STATUS_FILE = "outputs/ingest_status.json"
+CHANGE_DAILY = "outputs/daily_change_log.csv"
+RETRY_BASE = 60.0       # seconds before the first retry of a failed job; doubles per failure
+RETRY_MAX = 3600.0
+
+def write_json(path, obj):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=2)
+    os.replace(tmp, path)
+
+def read_json(path, default):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def run_stage(script, *args):
+    subprocess.run([sys.executable, os.path.join("scripts", script), *args], check=True)
+
+class IngestService:
+    def __init__(self, debounce=30.0, backfill=False):
+        self.debounce = debounce
+        self.done = read_json(STATE_FILE, None)  # path -> [mtime_ns, size, sha1] last processed
+        if self.done is None:
+            # First start: files already on disk were handled by the manual
+            # pipeline unless a backfill is asked for.
+            self.done = {} if backfill else {p: sig + [file_digest(p)] for p, sig in self.files()}
+            write_json(STATE_FILE, self.done)
+        self.pending = {}                        # path -> {"sig", "first_seen", "last_change"[, "retry_at"]}
+        self.queue = deque()                     # (kind, paths, first_seen)
+        self.queued = {}                         # path -> sig, waiting in or running from the queue
+        self.failures = {}                       # path -> consecutive failed attempts
+        self.last = {}
+
+    @staticmethod
+    def files():
+        for p in [p for g in STATE_GLOBS for p in glob.glob(g)] + glob.glob(SNAPSHOT_GLOB):
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            yield p, [st.st_mtime_ns, st.st_size]
+
+    def unchanged(self, p, sig):
+        # A touched or re-copied file with identical bytes is not new data.
+        prev = self.done.get(p)
+        if prev is None or prev[1] != sig[1]:
+            return False
+        if prev[0] == sig[0]:
+            return True
+        if file_digest(p) == prev[2]:
+            self.done[p] = sig + [prev[2]]
+            return True
+        return False
+
+    def scan(self):
+        now = time.time()
+        for p, sig in self.files():
+            if self.queued.get(p) == sig or self.unchanged(p, sig):
+                self.pending.pop(p, None)
+                continue
+            ev = self.pending.get(p)
+            if ev is None:
+                self.pending[p] = {"sig": sig, "first_seen": now, "last_change": now}
+            elif ev["sig"] != sig:
+                # New bytes get a fresh attempt once they settle.
+                ev.update(sig=sig, last_change=now)
+                ev.pop("retry_at", None)
+                self.failures.pop(p, None)
+
+    def promote(self, force=False):
+        # Files that have been quiet for `debounce` seconds become jobs. State
+        # files collapse into a single merge job; snapshots run in date order.
+        now = time.time()
+        ready = [p for p, ev in self.pending.items()
+                 if force or (now - ev["last_change"] >= self.debounce and now >= ev.get("retry_at", 0))]
+        if not ready:
+            return
+        states = [p for p in ready if not p.startswith(os.path.join("data", "snapshot_"))]
+        snaps = snapshot_store.by_snapshot_day([p for p in ready if p not in states])
+        if states and not any(k == "merge" for k, _, _ in self.queue):
+            self.queue.append(("merge", states, min(self.pending[p]["first_seen"] for p in states)))
+        elif states:
+            self.queue[[k for k, _, _ in self.queue].index("merge")][1].extend(states)
+        for p in snaps:
+            self.queue.append(("snapshot", [p], self.pending[p]["first_seen"]))
+        for p in ready:
+            self.queued[p] = self.pending.pop(p)["sig"]
+
+    def previous_snapshot(self, day):
+        # Once snapshot history exists it is the record of what each day looked
+        # like, so a day's predecessor always comes from it; loose data/ CSVs
+        # only stand in before the history starts.
+        if not day:
+            return None
+        history = snapshot_store.days()
+        if history:
+            earlier = [d for d in history if d < day]
+            return snapshot_store.reconstruct(earlier[-1]) if earlier else None
+        older = [p for p in glob.glob(SNAPSHOT_GLOB) if (snapshot_store.snapshot_day(p) or "") < day]
+        return load(snapshot_store.by_snapshot_day(older)[-1]) if older else None
+
+    def process_snapshot(self, path):
+        day = snapshot_store.snapshot_day(path)
+        new_df = load(path)
+        old_df = self.previous_snapshot(day)
+        history = snapshot_store.days()
+        nxt = [d for d in history if d > day][:1] if day else []
+        if day:
+            snapshot_store.put(day, new_df, before=old_df if history else None)
+        if old_df is None and not nxt:
+            print(f"[ingest] {path}: no earlier snapshot, recorded as baseline")
+            return
+        logs = []
+        if old_df is not None:
+            newest = not nxt and (not day or day >= max(snapshot_store.snapshot_day(p) or "" for p in glob.glob(SNAPSHOT_GLOB)))
+            logs.append(diff_and_write(old_df, new_df, day, CHANGE_DAILY, master=newest))
+            print(f"[ingest] {path}: {len(logs[-1]):,} changes")
+        if nxt:
+            # A late or re-sent day has stored days after it: the next one's
+            # changes were logged against a different predecessor, so they are
+            # redone too.
+            logs.append(detect_changes(new_df, snapshot_store.reconstruct(nxt[0]), nxt[0]).reindex(columns=CHANGE_COLS))
+            print(f"[ingest] {path}: re-diffed {nxt[0]} against it")
+        merge_change_log(pd.concat(logs, ignore_index=True), ([day] if day else []) + nxt)
+        run_stage("enrich_data.py")
+        run_stage("ai_summary.py")
+
+    def process(self, kind, paths):
+        if kind == "merge":
+            print(f"[ingest] merging {len(paths)} changed state file(s)")
+            run_stage("merge_data.py")
+            run_stage("resolve_entities.py")
+        else:
+            self.process_snapshot(paths[0])
+        run_stage("publish_data.py")
+
+    def drain(self):
+        while self.queue:
+            kind, paths, first_seen = self.queue[0]
+            self.write_status()
+            started = time.time()
+            try:
+                self.process(kind, paths)
+                ok = True
+                self.last = {"kind": kind, "paths": paths, "ok": True, "finished_at": time.time(),
+                             "lag_seconds": round(time.time() - first_seen, 1),
+                             "duration_seconds": round(time.time() - started, 1)}
+            except Exception as e:
+                ok = False
+                print(f"[ingest] {kind} {paths} failed: {e}")
+                self.last = {"kind": kind, "paths": paths, "ok": False, "error": str(e), "finished_at": time.time()}
+            self.queue.popleft()
+            for p in paths:
+                sig = self.queued.pop(p)
+                if ok:
+                    self.done[p] = sig + [file_digest(p) if os.path.exists(p) else ""]
+                    self.failures.pop(p, None)
+                else:
+                    self.retry_later(p, sig, first_seen)
+            write_json(STATE_FILE, self.done)
+        self.write_status()
+
+    def retry_later(self, p, sig, first_seen):
+        # A failed file goes back to pending (never to done), waiting longer
+        # after each consecutive failure.
+        n = self.failures[p] = self.failures.get(p, 0) + 1
+        now = time.time()
+        delay = min(RETRY_BASE * 2 ** (n - 1), RETRY_MAX)
+        self.pending[p] = {"sig": sig, "first_seen": first_seen, "last_change": now, "retry_at": now + delay}
+        print(f"[ingest] {p}: retry {n} in {delay:g}s")
+
+    def write_status(self):
+        now = time.time()
+        waiting = [ev["first_seen"] for ev in self.pending.values()] + [q[2] for q in self.queue]
+        write_json(STATUS_FILE, {
+            "updated_at": now,
+            "queue_depth": len(self.queue),
+            "debouncing": sum(1 for ev in self.pending.values() if "retry_at" not in ev),
+            "retrying": sum(1 for ev in self.pending.values() if "retry_at" in ev),
+            "lag_seconds": round(now - min(waiting), 1) if waiting else 0.0,
+            "last_run": self.last,
+        })
+
+    def tick(self, force=False):
+        self.scan()
+        self.promote(force)
+        self.drain()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--interval", type=float, default=5.0, help="seconds between scans")
+    ap.add_argument("--debounce", type=float, default=30.0, help="quiet seconds before a file is processed")
+    ap.add_argument("--once", action="store_true", help="process whatever is new now and exit")
+    ap.add_argument("--backfill", action="store_true", help="on first start, also process files already present")
+    args = ap.parse_args()
+
+    svc = IngestService(args.debounce, args.backfill)
+    if args.once:
+        svc.tick(force=True)
+        return
+    print(f"[ingest] watching data/states/ and data/ (every {args.interval:g}s, debounce {args.debounce:g}s)")
+    while True:
+        svc.tick()
+        time.sleep(args.interval)
+
+if __name__ == "__main__":
+    main()
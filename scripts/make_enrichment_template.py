@@ -1,28 +1,40 @@
 import pandas as pd, os
+import datastore
+from enrichment_queue import EnrichmentQueue
 
-log_path = "outputs/daily_change_log_all.csv"
 master_path = "outputs/master_current.csv"
+enriched_path = "outputs/enriched_mca.csv"
+TEMPLATE_ROWS = 120
 
-if not (os.path.exists(log_path) and os.path.exists(master_path)):
+log_path = datastore.csv_path("changes")
+if not (log_path and os.path.exists(master_path)):
     raise SystemExit("Run the three-day pipeline first")
 
-cl = pd.read_csv(log_path, dtype=str, low_memory=False)
 m  = pd.read_csv(master_path, dtype=str, low_memory=False)
+enriched = pd.read_csv(enriched_path, dtype=str, low_memory=False) \
+    if os.path.exists(enriched_path) and os.path.getsize(enriched_path) > 0 else pd.DataFrame()
 
 needed = ["CIN","CompanyName","State","Status"]
 for c in needed:
     if c not in m.columns:
         m[c] = ""
 
-master_sub = m[["CIN","CompanyName","State","Status"]]
-changed = cl.merge(master_sub, on="CIN", how="left")
+# The template lists what the enrichment queue would hand out next; peeking
+# leaves those CINs queued for enrich_data.py.
+q = EnrichmentQueue.load()
+q.sync(m, enriched)
+q.save()
+top = pd.DataFrame(q.peek(TEMPLATE_ROWS), columns=["CIN","Change_Type","Date"])
 
-priority = pd.Categorical(changed["Change_Type"], ["New_Incorporation","Field_Update","Removed"])
-changed["__prio"] = priority
-template = (changed.sort_values(["__prio"])
-                  .drop(columns=["__prio"])
-                  .drop_duplicates("CIN")
-                  .head(120))
+cl = pd.read_csv(log_path, dtype=str, low_memory=False)
+detail = (cl[cl["CIN"].isin(top["CIN"])]
+            .drop_duplicates(["CIN","Change_Type","Date"], keep="last")
+            [["CIN","Change_Type","Date","Field_Changed","Old_Value","New_Value"]])
+master_sub = m[needed].drop_duplicates("CIN")
+template = (top[["CIN","Change_Type","Date"]]
+              .merge(detail, on=["CIN","Change_Type","Date"], how="left")
+              .drop_duplicates("CIN")
+              .merge(master_sub, on="CIN", how="left"))
 
 template = template.assign(Sector="", Directors="", RegisteredAddress="", SOURCE="", SOURCE_URL="")
 
@@ -33,5 +45,5 @@ for c in cols:
 
 template = template[cols]
 os.makedirs("outputs", exist_ok=True)
-template.to_csv("outputs/enrichment_template.csv", index=False)
+datastore.write_csv_atomic(template, "outputs/enrichment_template.csv")
 print("Wrote outputs/enrichment_template.csv")
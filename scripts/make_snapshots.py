@@ -1,4 +1,9 @@
-import pandas as pd, os, datetime as dt
+import pandas as pd, os, argparse, datetime as dt
+import snapshot_store
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--full", action="store_true", help="also write full data/snapshot_<day>.csv copies")
+args = ap.parse_args()
 
 os.makedirs("data", exist_ok=True)
 src = "outputs/mca_master.csv"
@@ -10,15 +15,18 @@ df = pd.read_csv(src, dtype=str, low_memory=False)
 day1 = (dt.date.today() - dt.timedelta(days=1)).isoformat()
 day2 = dt.date.today().isoformat()
 
-snap1 = f"data/snapshot_{day1}.csv"
-snap2 = f"data/snapshot_{day2}.csv"
-
-df.to_csv(snap1, index=False)
-
 df2 = df.copy()
 if "AuthorizedCapital" in df2.columns:
     ac = pd.to_numeric(df2["AuthorizedCapital"], errors="coerce").fillna(0).astype(int)
     df2["AuthorizedCapital"] = (ac + 100000).astype(str)
-df2.to_csv(snap2, index=False)
 
-print(f"Created:\n  {snap1}\n  {snap2}")
+snapshot_store.write_base(day1, df)
+snapshot_store.write_delta(day2, df, df2)
+print(f"Stored in {snapshot_store.HISTORY_DIR}:\n  base {day1}\n  delta {day2}")
+
+if args.full:
+    snap1 = f"data/snapshot_{day1}.csv"
+    snap2 = f"data/snapshot_{day2}.csv"
+    df.to_csv(snap1, index=False)
+    df2.to_csv(snap2, index=False)
+    print(f"Created:\n  {snap1}\n  {snap2}")
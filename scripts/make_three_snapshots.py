@@ -1,4 +1,9 @@
-import pandas as pd, os, datetime as dt
+import pandas as pd, os, argparse, datetime as dt
+import snapshot_store
+
+ap = argparse.ArgumentParser()
+ap.add_argument("--full", action="store_true", help="also write full data/snapshot_<day>.csv copies")
+args = ap.parse_args()
 
 os.makedirs("data", exist_ok=True)
 src = "outputs/mca_master.csv"
@@ -11,22 +16,22 @@ d1 = (dt.date.today() - dt.timedelta(days=2)).isoformat()
 d2 = (dt.date.today() - dt.timedelta(days=1)).isoformat()
 d3 = dt.date.today().isoformat()
 
-s1 = f"data/snapshot_{d1}.csv"
-s2 = f"data/snapshot_{d2}.csv"
-s3 = f"data/snapshot_{d3}.csv"
-
-df.to_csv(s1, index=False)
-
 df2 = df.copy()
 if "AuthorizedCapital" in df2.columns:
     ac = pd.to_numeric(df2["AuthorizedCapital"], errors="coerce").fillna(0).astype(int)
     df2["AuthorizedCapital"] = (ac + 100000).astype(str)
-df2.to_csv(s2, index=False)
 
 df3 = df2.copy()
 if "Status" in df3.columns:
     mask = df3.index.to_series().mod(50).eq(0)
     df3.loc[mask, "Status"] = "Strike Off"
-df3.to_csv(s3, index=False)
 
-print(f"Created:\n  {s1}\n  {s2}\n  {s3}")
+snapshot_store.write_base(d1, df)
+snapshot_store.write_delta(d2, df, df2)
+snapshot_store.write_delta(d3, df2, df3)
+print(f"Stored in {snapshot_store.HISTORY_DIR}:\n  base {d1}\n  delta {d2}\n  delta {d3}")
+
+if args.full:
+    for day, frame in ((d1, df), (d2, df2), (d3, df3)):
+        frame.to_csv(f"data/snapshot_{day}.csv", index=False)
+    print(f"Created:\n  data/snapshot_{d1}.csv\n  data/snapshot_{d2}.csv\n  data/snapshot_{d3}.csv")
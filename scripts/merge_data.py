@@ -1,4 +1,6 @@
 import pandas as pd, glob, os
+from datastore import write_csv_atomic
+import validate_data
 
 RENAME_MAP = {
     "LLPIN/CIN":"CIN","CIN":"CIN",
@@ -12,6 +14,88 @@ RENAME_MAP = {
     "Class":"Class"
 }
 
+# CIN layout: L/U listing | 5-digit NIC | 2-letter state | 4-digit year |
+# 3-letter company type | 6-digit registration number. LLPINs (AAA-1234)
+# carry no decodable attributes beyond being an LLP.
+CIN_STATES = {
+    "AN":"Andaman and Nicobar Islands","AP":"Andhra Pradesh","AR":"Arunachal Pradesh","AS":"Assam",
+    "BR":"Bihar","CH":"Chandigarh","CT":"Chhattisgarh","CG":"Chhattisgarh","DD":"Daman and Diu",
+    "DL":"Delhi","DN":"Dadra and Nagar Haveli","GA":"Goa","GJ":"Gujarat","HP":"Himachal Pradesh",
+    "HR":"Haryana","JH":"Jharkhand","JK":"Jammu and Kashmir","KA":"Karnataka","KL":"Kerala",
+    "LA":"Ladakh","LD":"Lakshadweep","MH":"Maharashtra","ML":"Meghalaya","MN":"Manipur",
+    "MP":"Madhya Pradesh","MZ":"Mizoram","NL":"Nagaland","OR":"Odisha","OD":"Odisha","PB":"Punjab",
+    "PY":"Puducherry","RJ":"Rajasthan","SK":"Sikkim","TG":"Telangana","TS":"Telangana",
+    "TN":"Tamil Nadu","TR":"Tripura","UP":"Uttar Pradesh","UR":"Uttarakhand","UT":"Uttarakhand",
+    "WB":"West Bengal",
+}
+
+# Home state of each Registrar of Companies office, keyed by the name after
+# "RoC-". Some registrars also cover neighbouring states, so a decodable CIN
+# state code wins over these.
+ROC_STATES = {
+    "AHMEDABAD":"Gujarat","BANGALORE":"Karnataka","BENGALURU":"Karnataka","CHANDIGARH":"Chandigarh",
+    "CHENNAI":"Tamil Nadu","CHHATTISGARH":"Chhattisgarh","COIMBATORE":"Tamil Nadu","CUTTACK":"Odisha",
+    "DELHI":"Delhi","ERNAKULAM":"Kerala","GOA":"Goa","GWALIOR":"Madhya Pradesh","HIMACHAL PRADESH":"Himachal Pradesh",
+    "HYDERABAD":"Telangana","JAIPUR":"Rajasthan","JAMMU":"Jammu and Kashmir","JHARKHAND":"Jharkhand",
+    "KANPUR":"Uttar Pradesh","KOLKATA":"West Bengal","MUMBAI":"Maharashtra","PATNA":"Bihar","PUDUCHERRY":"Puducherry",
+    "PUNE":"Maharashtra","SHILLONG":"Meghalaya","UTTARAKHAND":"Uttarakhand","VIJAYAWADA":"Andhra Pradesh",
+}
+ROC_RE = r"(?i)^roc\s*[-/ ]\s*(.+)$"
+
+# NIC 2008 sections by 2-digit division: (last division of section, name).
+NIC_SECTIONS = [
+    (3, "Agriculture, forestry and fishing"), (9, "Mining and quarrying"), (33, "Manufacturing"),
+    (35, "Electricity and gas"), (39, "Water supply and waste management"), (43, "Construction"),
+    (47, "Wholesale and retail trade"), (53, "Transportation and storage"),
+    (56, "Accommodation and food service"), (63, "Information and communication"),
+    (66, "Financial and insurance"), (68, "Real estate"), (75, "Professional and technical services"),
+    (82, "Administrative and support services"), (84, "Public administration and defence"),
+    (85, "Education"), (88, "Health and social work"), (93, "Arts and recreation"),
+    (96, "Other services"), (98, "Households as employers"), (99, "Extraterritorial organisations"),
+]
+
+def decode_cin(df):
+    # All decoding is column-wise string slicing of the canonical form, so
+    # spaced or hyphenated CINs decode too; malformed identifiers simply
+    # decode to empty values.
+    cin = validate_data.canonical_cin(df["CIN"].fillna("").astype(str).str.strip().str.upper())
+    is_cin = cin.str.len().eq(21)
+    is_llp = cin.str.len().eq(8)
+    part = lambda a, b: cin.str.slice(a, b).where(is_cin, "")
+    out = pd.DataFrame(index=df.index)
+    out["EntityType"] = pd.Series("", index=df.index).mask(is_cin, "Company").mask(is_llp, "LLP")
+    out["Listing"] = part(0, 1).map({"L": "Listed", "U": "Unlisted"}).fillna("")
+    out["NIC_Code"] = part(1, 6)
+    out["CIN_StateCode"] = part(6, 8)
+    out["CIN_Year"] = part(8, 12)
+    out["CompanyType"] = part(12, 15)
+    out["RegistrationNo"] = part(15, 21)
+    div = pd.to_numeric(out["NIC_Code"].str.slice(0, 2), errors="coerce")
+    bounds = [0] + [hi for hi, _ in NIC_SECTIONS]
+    out["Sector"] = pd.cut(div, bounds, labels=[name for _, name in NIC_SECTIONS]).astype(object).fillna("")
+    return out
+
+def add_decoded_columns(master):
+    dec = decode_cin(master)
+    master = master.drop(columns=[c for c in dec.columns if c in master.columns]).join(dec)
+    # State holds state names only: CompanyROCcode/ROC values are renamed onto
+    # it, so registrar codes are replaced by the CIN's state (or the
+    # registrar's home state for LLPs) and kept as-is in ROC.
+    raw = (master["State"].fillna("").astype(str).str.strip() if "State" in master.columns
+           else pd.Series("", index=master.index))
+    office = raw.str.extract(ROC_RE, expand=False)
+    is_roc = office.notna()
+    from_cin = dec["CIN_StateCode"].map(CIN_STATES)
+    from_roc = office.str.strip().str.upper().map(ROC_STATES)
+    master["State"] = raw.mask(is_roc | raw.eq(""), from_cin).fillna(from_roc).fillna("")
+    master["ROC"] = raw.where(is_roc, "")
+    year = pd.Series("", index=master.index)
+    if "IncorporationDate" in master.columns:
+        # Dates are ISO strings once validate_data has run.
+        year = master["IncorporationDate"].fillna("").str.slice(0, 4)
+    master["Year"] = year.mask(year.eq(""), dec["CIN_Year"])
+    return master
+
 def read_any(path):
     ext = os.path.splitext(path)[1].lower()
     if ext == ".csv":
@@ -30,10 +114,13 @@ def main():
         df = read_any(f)
         df = df.rename(columns={c: RENAME_MAP.get(c, c) for c in df.columns})
         dfs.append(df)
-    master = pd.concat(dfs, ignore_index=True).drop_duplicates(subset=["CIN"]).reset_index(drop=True)
+    # Validation also drops repeated CINs (first valid row wins) and sends
+    # malformed rows to outputs/quarantine.csv.
+    master, _ = validate_data.run(pd.concat(dfs, ignore_index=True))
+    master = add_decoded_columns(master)
     os.makedirs("outputs", exist_ok=True)
-    master.to_csv("outputs/mca_master.csv", index=False)
-    master.to_csv("outputs/master_current.csv", index=False)
+    write_csv_atomic(master, "outputs/mca_master.csv")
+    write_csv_atomic(master, "outputs/master_current.csv")
 
 if __name__ == "__main__":
     main()
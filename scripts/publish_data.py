@@ -0,0 +1,105 @@
+import pandas as pd, os, json, time, shutil, hashlib, argparse
+from datastore import VERSIONS_DIR, CURRENT, CSV_SOURCES, csv_path, current_version
+
+# Publishes one pipeline run as an immutable version:
+#
+#   outputs/versions/<id>/<table>.arrow   uncompressed Arrow IPC (Feather v2)
+#   outputs/versions/<id>/manifest.json   rows, columns, bytes and sha256 per table
+#   outputs/CURRENT                       id of the live version, swapped atomically
+#
+# Old versions beyond the retention count are garbage-collected afterwards.
+
+KEEP_VERSIONS = 5
+
+def sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def write_table(name, df, out_dir):
+    import pyarrow as pa, pyarrow.feather as feather
+    path = os.path.join(out_dir, f"{name}.arrow")
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), path, compression="uncompressed")
+    return {"file": os.path.basename(path), "rows": len(df), "columns": list(map(str, df.columns)),
+            "bytes": os.path.getsize(path), "sha256": sha256(path)}
+
+def new_version_id():
+    t = time.time()
+    return time.strftime("%Y%m%dT%H%M%S", time.gmtime(t)) + f"{int(t * 1e6) % 1_000_000:06d}Z"
+
+def swap_current(vid):
+    tmp = f"{CURRENT}.tmp-{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(vid + "\n")
+    os.replace(tmp, CURRENT)
+
+def publish(tables):
+    # Everything is written under a hidden staging name and renamed into place
+    # only once complete; the CURRENT swap is what readers observe.
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+    vid = new_version_id()
+    staging = os.path.join(VERSIONS_DIR, f".staging-{vid}")
+    os.makedirs(staging)
+    try:
+        entries = {}
+        for name, (df, src) in tables.items():
+            entries[name] = dict(write_table(name, df, staging), source=src)
+        with open(os.path.join(staging, "manifest.json"), "w") as f:
+            json.dump({"version": vid, "created_at": time.time(), "previous": current_version(),
+                       "tables": entries}, f, indent=2)
+        os.rename(staging, os.path.join(VERSIONS_DIR, vid))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    swap_current(vid)
+    return vid
+
+def gc_versions(keep=KEEP_VERSIONS):
+    # Keeps the newest `keep` versions and always the live one. Readers that
+    # still have an old version memory-mapped keep working on POSIX; where the
+    # OS refuses to delete an open file the version is retried next time.
+    live = current_version()
+    entries = os.listdir(VERSIONS_DIR) if os.path.isdir(VERSIONS_DIR) else []
+    names = sorted(n for n in entries if not n.startswith("."))
+    removed = []
+    for n in entries:
+        # Staging dirs left behind by a crashed publish.
+        p = os.path.join(VERSIONS_DIR, n)
+        if n.startswith(".staging-") and time.time() - os.path.getmtime(p) > 3600:
+            shutil.rmtree(p, ignore_errors=True)
+    for n in names[:-keep] if keep > 0 else []:
+        if n == live:
+            continue
+        try:
+            shutil.rmtree(os.path.join(VERSIONS_DIR, n))
+            removed.append(n)
+        except OSError:
+            pass
+    return removed
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keep", type=int, default=KEEP_VERSIONS, help="published versions to retain")
+    args = ap.parse_args()
+
+    tables = {}
+    for name in CSV_SOURCES:
+        src = csv_path(name)
+        if src is None:
+            continue
+        df = pd.read_csv(src, dtype=str, low_memory=False)
+        tables[name] = (df, src)
+    if not tables:
+        raise SystemExit("Nothing to publish; run the pipeline first")
+    vid = publish(tables)
+    for name, (df, src) in tables.items():
+        print(f"  {name}: {len(df):,} rows from {src}")
+    print(f"Published version {vid}")
+    removed = gc_versions(args.keep)
+    if removed:
+        print(f"Removed old versions: {', '.join(removed)}")
+
+if __name__ == "__main__":
+    main()
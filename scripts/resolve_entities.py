@@ -0,0 +1,267 @@
+import pandas as pd, numpy as np, os, argparse, time
+from datastore import write_csv_atomic
+
+# Entity resolution over the merged master. Rows are grouped by cheap blocking
+# keys, compared only against their sorted neighbours inside each block
+# (near-linear, never all-pairs), pre-filtered with vectorized MinHash
+# similarity of name trigrams, verified with exact trigram Jaccard and
+# clustered with union-find.
+#
+# A name match alone never links two different well-formed CINs: the pair
+# also needs the same numbers in the name and corroborating evidence (same
+# registration number, CINs one character apart, or the same incorporation
+# date). Every member of a cluster must also match the cluster's root
+# directly, so weak links cannot chain unrelated companies together.
+
+SRC = "outputs/mca_master.csv"
+FALLBACK = "outputs/master_current.csv"
+OUT = "outputs/entity_clusters.csv"
+
+LEGAL_TOKENS = r"\b(?:private|pvt|limited|ltd|llp|company|co|the|and|of|india|opc)\b"
+NAME_WIDTH = 64
+NUM_HASHES = 24
+HASH_PRIME = np.uint64((1 << 31) - 1)
+CHUNK_ROWS = 50000
+MINHASH_SLACK = 0.15          # MinHash only pre-filters; exact Jaccard decides
+VALID_CIN = r"[LU]\d{5}[A-Z]{2}\d{4}[A-Z]{3}\d{6}|[A-Z]{3}\d{4}"
+
+def norm_cin(s):
+    return s.fillna("").str.upper().str.replace(r"[^A-Z0-9]", "", regex=True)
+
+def norm_name(s):
+    s = s.fillna("").str.lower().str.replace(r"[^a-z0-9 ]", " ", regex=True)
+    s = s.str.replace(LEGAL_TOKENS, " ", regex=True)
+    return s.str.replace(r"\s+", " ", regex=True).str.strip()
+
+def prepare(df):
+    out = pd.DataFrame(index=df.index)
+    out["cin_key"] = norm_cin(df.get("CIN", pd.Series("", index=df.index)))
+    out["name"] = norm_name(df.get("CompanyName", pd.Series("", index=df.index)))
+    out["state"] = df.get("State", pd.Series("", index=df.index)).fillna("").str.strip().str.lower()
+    if "Year" in df.columns:
+        out["year"] = df["Year"].fillna("").astype(str)
+    else:
+        year = pd.to_datetime(df.get("IncorporationDate", pd.Series(index=df.index, dtype=str)), errors="coerce").dt.year
+        out["year"] = year.astype("Int64").astype(str).fillna("").replace("<NA>", "")
+    out["valid_cin"] = out["cin_key"].str.fullmatch(VALID_CIN).to_numpy(dtype=bool)
+    out["date"] = df.get("IncorporationDate", pd.Series("", index=df.index)).fillna("").astype(str).str.strip()
+    out["digits"] = out["name"].str.findall(r"\d+").str.join(" ").fillna("")
+    tok = out["name"].str.split(n=2, expand=True).reindex(columns=[0, 1]).fillna("")
+    out["tok1"], out["tok2"] = tok[0], tok[1]
+    return out.reset_index(drop=True)
+
+def blocking_keys(p):
+    # Each pass is one way two records can land next to each other; the union of
+    # their candidates is scored. Cross-state duplicates are caught by pass 2,
+    # CINs that differ only in the last digit (typos) by pass 3.
+    cin21 = p["cin_key"].str.len().eq(21) & p["valid_cin"]
+    own = pd.Series(np.arange(len(p)), index=p.index).astype(str).radd("#")
+    return [
+        p["state"] + "|" + p["year"] + "|" + p["tok1"],
+        p["year"] + "|" + p["tok1"] + " " + p["tok2"],
+        p["cin_key"].str.slice(0, 20).where(cin21, own),
+    ]
+
+def neighbour_pairs(key, name_rank, valid, window):
+    k = pd.factorize(key)[0]
+    order = np.lexsort((name_rank, k))
+    order = order[valid[order]]
+    k = k[order]
+    left, right = [], []
+    for d in range(1, window + 1):
+        same = k[:-d] == k[d:]
+        left.append(order[:-d][same])
+        right.append(order[d:][same])
+    if not left:
+        return np.empty((0, 2), dtype=np.int64)
+    return np.column_stack([np.concatenate(left), np.concatenate(right)])
+
+def cin_pairs(cin_key):
+    # Reformatted CINs/LLPINs collapse to the same normalized key.
+    c = cin_key.to_numpy()
+    order = np.argsort(c, kind="stable")
+    order = order[c[order] != ""]
+    same = c[order][:-1] == c[order][1:]
+    return np.column_stack([order[:-1][same], order[1:][same]])
+
+def candidate_pairs(p, window):
+    name_rank = pd.factorize(p["name"], sort=True)[0]
+    valid = (p["name"] != "").to_numpy()
+    parts = [neighbour_pairs(k, name_rank, valid, window) for k in blocking_keys(p)]
+    pairs = np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.int64)
+    lo, hi = pairs.min(axis=1), pairs.max(axis=1)
+    code = np.sort(lo.astype(np.int64) * len(p) + hi)
+    code = code[np.r_[True, code[1:] != code[:-1]]] if len(code) else code
+    return np.column_stack([code // len(p), code % len(p)])
+
+def minhash(names, num_hashes=NUM_HASHES, seed=7):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, int(HASH_PRIME), size=num_hashes, dtype=np.uint64)
+    b = rng.integers(0, int(HASH_PRIME), size=num_hashes, dtype=np.uint64)
+    sig = np.empty((len(names), num_hashes), dtype=np.uint64)
+    fixed = names.str.slice(0, NAME_WIDTH).str.ljust(3)
+    for start in range(0, len(names), CHUNK_ROWS):
+        part = fixed.iloc[start:start + CHUNK_ROWS]
+        raw = np.array(part.tolist(), dtype=f"S{NAME_WIDTH}").view(np.uint8).reshape(len(part), NAME_WIDTH)
+        grams = (raw[:, :-2].astype(np.uint64) << 16) | (raw[:, 1:-1].astype(np.uint64) << 8) | raw[:, 2:]
+        lens = part.str.len().to_numpy()
+        pad = np.arange(NAME_WIDTH - 2)[None, :] > (lens[:, None] - 3)
+        for i in range(num_hashes):
+            h = (a[i] * grams + b[i]) % HASH_PRIME
+            h[pad] = np.iinfo(np.uint64).max
+            sig[start:start + len(part), i] = h.min(axis=1)
+    return sig
+
+def score_pairs(sig, empty, pairs):
+    s = np.empty(len(pairs))
+    for start in range(0, len(pairs), CHUNK_ROWS * 10):
+        a, b = pairs[start:start + CHUNK_ROWS * 10, 0], pairs[start:start + CHUNK_ROWS * 10, 1]
+        s[start:start + len(a)] = (sig[a] == sig[b]).mean(axis=1)
+    s[empty[pairs[:, 0]] | empty[pairs[:, 1]]] = 0.0
+    return s
+
+def trigram_sets(names):
+    # Row-wise sorted, de-duplicated trigram codes; unused slots hold -1.
+    out = np.empty((len(names), NAME_WIDTH - 2), dtype=np.int32)
+    for start in range(0, len(names), CHUNK_ROWS):
+        part = names.iloc[start:start + CHUNK_ROWS].str.slice(0, NAME_WIDTH).str.ljust(3)
+        raw = np.array(part.tolist(), dtype=f"S{NAME_WIDTH}").view(np.uint8).reshape(len(part), NAME_WIDTH)
+        grams = (raw[:, :-2].astype(np.int32) << 16) | (raw[:, 1:-1].astype(np.int32) << 8) | raw[:, 2:]
+        lens = part.str.len().to_numpy()
+        grams[np.arange(NAME_WIDTH - 2)[None, :] > (lens[:, None] - 3)] = -1
+        grams.sort(axis=1)
+        grams[:, 1:][grams[:, 1:] == grams[:, :-1]] = -1
+        out[start:start + len(part)] = grams
+    return out, (out >= 0).sum(axis=1)
+
+def jaccard(names, pairs):
+    # Exact trigram Jaccard; only run on pairs that survived the cheaper
+    # filters. Both sets are concatenated and sorted, so every adjacent equal
+    # pair of real codes is one shared trigram.
+    out = np.zeros(len(pairs))
+    if not len(pairs):
+        return out
+    rows = np.unique(pairs)
+    grams, count = trigram_sets(names.iloc[rows])
+    pos = np.searchsorted(rows, pairs)
+    for start in range(0, len(pairs), CHUNK_ROWS):
+        a, b = pos[start:start + CHUNK_ROWS, 0], pos[start:start + CHUNK_ROWS, 1]
+        both = np.sort(np.concatenate([grams[a], grams[b]], axis=1), axis=1)
+        inter = ((both[:, 1:] == both[:, :-1]) & (both[:, 1:] >= 0)).sum(axis=1)
+        union = count[a] + count[b] - inter
+        out[start:start + len(a)] = np.where(union > 0, inter / np.maximum(union, 1), 0.0)
+    return out
+
+def corroborated(p, pairs):
+    # Pairs where both sides carry distinct well-formed CINs need more than a
+    # similar name.
+    if not len(pairs):
+        return np.zeros(0, dtype=bool)
+    a, b = pairs[:, 0], pairs[:, 1]
+    cin = p["cin_key"].to_numpy(dtype=object)
+    valid = p["valid_cin"].to_numpy()
+    digits = p["digits"].to_numpy(dtype=object)
+    dates = p["date"].to_numpy(dtype=object)
+    same_digits = digits[a] == digits[b]
+    distinct = valid[a] & valid[b] & (cin[a] != cin[b])
+    def fixed(c):
+        return np.array(c.tolist(), dtype="S21").view(np.uint8).reshape(len(c), 21)
+    ra, rb = fixed(cin[a]), fixed(cin[b])
+    lens = p["cin_key"].str.len().to_numpy()
+    near = (lens[a] == lens[b]) & ((ra != rb).sum(axis=1) <= 1)
+    same_reg = (lens[a] == 21) & (lens[b] == 21) & (ra[:, 15:] == rb[:, 15:]).all(axis=1)
+    same_date = (dates[a] == dates[b]) & (dates[a] != "")
+    return same_digits & (~distinct | near | same_reg | same_date)
+
+def connected_components(n, pairs):
+    labels = np.arange(n)
+    if not len(pairs):
+        return labels
+    a, b = pairs[:, 0], pairs[:, 1]
+    while True:
+        m = np.minimum(labels[a], labels[b])
+        prev = labels.copy()
+        np.minimum.at(labels, a, m)
+        np.minimum.at(labels, b, m)
+        labels = labels[labels]
+        if np.array_equal(labels, prev):
+            return labels
+
+def detach_chained(p, labels, names, threshold):
+    # Members that do not match their cluster root directly (same normalized
+    # CIN, or a verified and corroborated name match) were only reached through
+    # a chain of links; they are split off as their own entities.
+    idx = np.nonzero(labels != np.arange(len(labels)))[0]
+    if not len(idx):
+        return labels
+    pairs = np.column_stack([idx, labels[idx]])
+    cin = p["cin_key"].to_numpy(dtype=object)
+    ok = (cin[idx] == cin[labels[idx]]) & (cin[idx] != "")
+    check = ~ok
+    if check.any():
+        sub = pairs[check]
+        fine = corroborated(p, sub)
+        fine[fine] = jaccard(names, sub[fine]) >= threshold
+        ok[check] = fine
+    labels = labels.copy()
+    labels[idx[~ok]] = idx[~ok]
+    return labels
+
+def resolve(df, threshold=0.8, window=10, stats=None):
+    if df.empty:
+        return pd.DataFrame(columns=["CIN","ClusterID","ClusterSize"])
+    t0 = time.perf_counter()
+    p = prepare(df)
+    cand = candidate_pairs(p, window)
+    t1 = time.perf_counter()
+    sig = minhash(p["name"])
+    t_sig = time.perf_counter()
+    scores = score_pairs(sig, (p["name"] == "").to_numpy(), cand)
+    t2 = time.perf_counter()
+    names = p["name"]
+    cand = cand[scores >= threshold - MINHASH_SLACK]
+    cand = cand[corroborated(p, cand)]
+    name_links = cand[jaccard(names, cand) >= threshold]
+    same_cin = cin_pairs(p["cin_key"])
+    labels = connected_components(len(p), np.concatenate([same_cin, name_links]))
+    labels = detach_chained(p, labels, names, threshold)
+    t3 = time.perf_counter()
+    if stats is not None:
+        stats.update({
+            "rows": len(p), "candidate_pairs": int(len(scores)),
+            "linked_pairs": int(len(same_cin) + len(name_links)),
+            "blocking_s": t1 - t0, "signature_s": t_sig - t1, "scoring_s": t2 - t_sig,
+            "clustering_s": t3 - t2, "pairs_per_s": len(scores) / (t2 - t_sig) if t2 > t_sig else float("inf"),
+        })
+    cins = df["CIN"].fillna("").to_numpy()
+    out = pd.DataFrame({"CIN": cins, "ClusterID": cins[labels]})
+    if "CIN_AsFiled" in df.columns:
+        out.insert(1, "CIN_AsFiled", df["CIN_AsFiled"].fillna("").to_numpy())
+    out["ClusterSize"] = out.groupby("ClusterID")["CIN"].transform("size")
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default=SRC if os.path.exists(SRC) else FALLBACK)
+    ap.add_argument("--out", default=OUT)
+    ap.add_argument("--threshold", type=float, default=0.8)
+    ap.add_argument("--window", type=int, default=10)
+    ap.add_argument("--bench", action="store_true", help="print timings and pairs evaluated per second")
+    args = ap.parse_args()
+
+    if not os.path.exists(args.src):
+        raise SystemExit("Run `python scripts/merge_data.py` first")
+    df = pd.read_csv(args.src, dtype=str, low_memory=False)
+    stats = {}
+    clusters = resolve(df, args.threshold, args.window, stats)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    write_csv_atomic(clusters, args.out)
+    print(f"Wrote {args.out}: {stats['rows']:,} rows -> {clusters['ClusterID'].nunique():,} entities")
+    if args.bench:
+        print(f"  candidates {stats['candidate_pairs']:,}, linked {stats['linked_pairs']:,}")
+        print(f"  blocking {stats['blocking_s']:.2f}s, signatures {stats['signature_s']:.2f}s, "
+              f"scoring {stats['scoring_s']:.2f}s, clustering {stats['clustering_s']:.2f}s")
+        print(f"  {stats['pairs_per_s']:,.0f} pairs/s")
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,43 @@
-import os, glob, subprocess, pandas as pd
+import os, glob, subprocess, datetime as dt, pandas as pd
+from detect_changes import CHANGE_COLS, diff_and_write, merge_change_log
+import snapshot_store
 
 def newest_three(pattern):
-    files = sorted(glob.glob(pattern), key=os.path.getmtime)
+    files = snapshot_store.by_snapshot_day(glob.glob(pattern))
     if len(files) < 3:
         raise SystemExit("Need at least three snapshot files in data/")
     return files[-3], files[-2], files[-1]
 
 def safe_read(path):
     if not os.path.exists(path) or os.path.getsize(path) == 0:
-        return pd.DataFrame(columns=["CIN","Change_Type","Field_Changed","Old_Value","New_Value","Date"])
+        return pd.DataFrame(columns=CHANGE_COLS)
     return pd.read_csv(path, dtype=str, low_memory=False)
 
+def diff_from_history(days):
+    # Rebuild the three days from base + deltas and diff them in-process.
+    frames = [snapshot_store.reconstruct(d) for d in days]
+    return [diff_and_write(frames[old], frames[new], days[new], out, master=new == 2)
+            for (old, new), out in zip([(0, 1), (1, 2)], ["outputs/change_log_d1_d2.csv", "outputs/change_log_d2_d3.csv"])]
+
 os.makedirs("outputs", exist_ok=True)
 
-d1, d2, d3 = newest_three("data/snapshot_*.csv")
-print(f"Snapshots:\n  {d1}\n  {d2}\n  {d3}")
+history = snapshot_store.days()
+if len(history) >= 3:
+    print(f"Snapshots (history):\n  {history[-3]}\n  {history[-2]}\n  {history[-1]}")
+    df1, df2 = diff_from_history(history[-3:])
+    days = history[-2:]
+else:
+    d1, d2, d3 = newest_three("data/snapshot_*.csv")
+    print(f"Snapshots:\n  {d1}\n  {d2}\n  {d3}")
 
-subprocess.run(["python","scripts/detect_changes.py","--old",d1,"--new",d2,"--out","outputs/change_log_d1_d2.csv"], check=True)
-subprocess.run(["python","scripts/detect_changes.py","--old",d2,"--new",d3,"--out","outputs/change_log_d2_d3.csv"], check=True)
+    days = []
+    for old, new, out in ((d1, d2, "outputs/change_log_d1_d2.csv"), (d2, d3, "outputs/change_log_d2_d3.csv")):
+        day = snapshot_store.snapshot_day(new) or dt.date.today().isoformat()
+        subprocess.run(["python","scripts/detect_changes.py","--old",old,"--new",new,"--out",out,"--date",day], check=True)
+        days.append(day)
 
-df1 = safe_read("outputs/change_log_d1_d2.csv")
-df2 = safe_read("outputs/change_log_d2_d3.csv")
-allc = pd.concat([df1, df2], ignore_index=True).drop_duplicates()
-allc.to_csv("outputs/daily_change_log_all.csv", index=False)
+    df1 = safe_read("outputs/change_log_d1_d2.csv")
+    df2 = safe_read("outputs/change_log_d2_d3.csv")
+# Replaces only the two days diffed here; earlier days in the cumulative log stay.
+merge_change_log(pd.concat([df1, df2], ignore_index=True).drop_duplicates(), days)
 print("Wrote outputs/change_log_d1_d2.csv, outputs/change_log_d2_d3.csv, outputs/daily_change_log_all.csv")
@@ -0,0 +1,187 @@
+import pandas as pd, numpy as np, os, glob, re, argparse
+
+# Snapshot history as periodic full bases plus small per-day deltas.
+#
+#   data/history/base_<day>.parquet   full snapshot for <day>
+#   data/history/delta_<day>.parquet  Op/CIN/Field/Value rows: every cell that differs
+#                                     from the previous day, plus added/removed rows
+#
+# A day is rebuilt from the newest base on or before it plus the deltas after
+# that base. Deltas diff every column, so a reconstructed day matches the
+# snapshot it was built from; missing values are stored as "" throughout.
+
+HISTORY_DIR = os.path.join("data", "history")
+DELTA_COLS = ["Op","CIN","Field","Value"]
+DAY_RE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+
+def snapshot_day(path):
+    m = DAY_RE.search(os.path.basename(path))
+    return m.group(1) if m else None
+
+def by_snapshot_day(paths):
+    # Order snapshot files by the date in their name (mtime only breaks ties
+    # or places undated files first), so copied or touched files keep their place.
+    return sorted(paths, key=lambda p: (snapshot_day(p) or "", os.path.getmtime(p)))
+
+def _path(kind, day, root=HISTORY_DIR):
+    return os.path.join(root, f"{kind}_{day}.parquet")
+
+def _days(kind, root=HISTORY_DIR):
+    out = []
+    for p in glob.glob(os.path.join(root, f"{kind}_*.parquet")):
+        m = DAY_RE.search(os.path.basename(p))
+        if m:
+            out.append(m.group(1))
+    return sorted(out)
+
+def bases(root=HISTORY_DIR):
+    return _days("base", root)
+
+def deltas(root=HISTORY_DIR):
+    return _days("delta", root)
+
+def days(root=HISTORY_DIR):
+    return sorted(set(bases(root)) | set(deltas(root)))
+
+def _normalize(df):
+    return df.drop_duplicates(subset=["CIN"]).fillna("").astype(str)
+
+def write_base(day, df, root=HISTORY_DIR):
+    os.makedirs(root, exist_ok=True)
+    _normalize(df).to_parquet(_path("base", day, root), index=False)
+
+def make_delta(old_df, new_df):
+    old = _normalize(old_df).set_index("CIN")
+    new = _normalize(new_df).set_index("CIN")
+    cols = old.columns.union(new.columns, sort=False)
+    old, new = old.reindex(columns=cols, fill_value=""), new.reindex(columns=cols, fill_value="")
+    common = new.index.intersection(old.index)
+    n = new.loc[common].to_numpy(dtype=object)
+    r, c = np.nonzero(old.loc[common].to_numpy(dtype=object) != n)
+    updates = pd.DataFrame({"Op": "update", "CIN": common[r], "Field": cols[c], "Value": n[r, c]})
+    adds = (new.loc[new.index.difference(old.index)].rename_axis("CIN").reset_index()
+               .melt(id_vars="CIN", var_name="Field", value_name="Value")
+               .assign(Op="add"))
+    removes = pd.DataFrame({"Op": "remove", "CIN": old.index.difference(new.index), "Field": "", "Value": ""})
+    delta = pd.concat([adds, removes, updates], ignore_index=True).reindex(columns=DELTA_COLS)
+    return delta.fillna("").astype(str)
+
+def write_delta(day, old_df, new_df, root=HISTORY_DIR):
+    os.makedirs(root, exist_ok=True)
+    make_delta(old_df, new_df).to_parquet(_path("delta", day, root), index=False)
+
+def apply_delta(df, delta):
+    df = df.set_index("CIN", drop=False)
+    rm = delta.loc[delta["Op"] == "remove", "CIN"]
+    if len(rm):
+        df = df[~df.index.isin(rm)]
+    add = delta[delta["Op"] == "add"]
+    if len(add):
+        wide = add.pivot_table(index="CIN", columns="Field", values="Value", aggfunc="last")
+        wide["CIN"] = wide.index
+        df = pd.concat([df[~df.index.isin(wide.index)], wide.reindex(columns=df.columns.union(wide.columns, sort=False))]).fillna("")
+    upd = delta[(delta["Op"] == "update") & delta["CIN"].isin(df.index)]
+    upd = upd.drop_duplicates(subset=["CIN","Field"], keep="last")
+    for field, grp in upd.groupby("Field", sort=False):
+        if field not in df.columns:
+            df[field] = ""
+        df.loc[grp["CIN"].to_numpy(), field] = grp["Value"].to_numpy()
+    return df.reset_index(drop=True)
+
+def reconstruct(day, root=HISTORY_DIR):
+    base_days = [b for b in bases(root) if b <= day]
+    if not base_days:
+        raise FileNotFoundError(f"No base snapshot on or before {day} in {root}")
+    b = base_days[-1]
+    df = pd.read_parquet(_path("base", b, root))
+    for d in deltas(root):
+        if b < d <= day:
+            df = apply_delta(df, pd.read_parquet(_path("delta", d, root)))
+    return df
+
+def compact(base_every=7, keep_bases=4, root=HISTORY_DIR):
+    # Roll chains longer than `base_every` deltas into a new base, then drop
+    # bases beyond `keep_bases` and any deltas that only they could resolve.
+    made = []
+    while True:
+        b = bases(root)[-1] if bases(root) else None
+        if b is None:
+            break
+        chain = [d for d in deltas(root) if d > b]
+        if len(chain) <= base_every:
+            break
+        nb = chain[base_every - 1]
+        write_base(nb, reconstruct(nb, root), root)
+        made.append(nb)
+    kept = bases(root)[-keep_bases:] if keep_bases > 0 else bases(root)
+    removed = []
+    for b in bases(root):
+        if b not in kept:
+            os.remove(_path("base", b, root))
+            removed.append(f"base_{b}")
+    for d in deltas(root):
+        if kept and d <= kept[0]:
+            os.remove(_path("delta", d, root))
+            removed.append(f"delta_{d}")
+    return made, removed
+
+def put(day, df, root=HISTORY_DIR, before=None):
+    # Records `day` wherever it falls, replacing it if already stored. A day
+    # with nothing stored before it becomes a base; otherwise it is a delta
+    # against the previous stored day (`before`, if the caller already rebuilt
+    # it). The next stored day's delta was computed against a different
+    # predecessor, so it is rebuilt against `df`.
+    known = days(root)
+    earlier = [d for d in known if d < day]
+    later = [d for d in known if d > day]
+    nxt = later[0] if later and later[0] not in bases(root) else None
+    after = reconstruct(nxt, root) if nxt else None
+    if not earlier or day in bases(root):
+        write_base(day, df, root)
+        if os.path.exists(_path("delta", day, root)):
+            os.remove(_path("delta", day, root))
+    else:
+        write_delta(day, reconstruct(earlier[-1], root) if before is None else before, df, root)
+    if nxt:
+        write_delta(nxt, df, after, root)
+
+def ingest(paths, root=HISTORY_DIR):
+    # Import existing full snapshot CSVs in date order; days already stored
+    # are replaced and days that fall between stored ones are spliced in.
+    from detect_changes import load
+    dated = sorted((snapshot_day(p), p) for p in paths if snapshot_day(p))
+    for day, p in dated:
+        put(day, load(p), root)
+    return [d for d, _ in dated]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=HISTORY_DIR)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p_in = sub.add_parser("ingest", help="import full snapshot CSVs as base + deltas")
+    p_in.add_argument("paths", nargs="+")
+    p_re = sub.add_parser("reconstruct", help="rebuild one day's snapshot")
+    p_re.add_argument("--day", required=True)
+    p_re.add_argument("--out")
+    p_co = sub.add_parser("compact", help="roll old deltas into new bases")
+    p_co.add_argument("--base-every", type=int, default=7)
+    p_co.add_argument("--keep-bases", type=int, default=4)
+    sub.add_parser("list", help="show stored bases and deltas")
+    args = ap.parse_args()
+
+    if args.cmd == "ingest":
+        print("Ingested:", ", ".join(ingest(args.paths, args.root)))
+    elif args.cmd == "reconstruct":
+        out = args.out or f"data/snapshot_{args.day}.csv"
+        reconstruct(args.day, args.root).to_csv(out, index=False)
+        print(f"Wrote {out}")
+    elif args.cmd == "compact":
+        made, removed = compact(args.base_every, args.keep_bases, args.root)
+        print(f"New bases: {made or '-'}\nRemoved: {removed or '-'}")
+    else:
+        for d in days(args.root):
+            kind = "base" if d in bases(args.root) else "delta"
+            print(f"{d}  {kind}  {os.path.getsize(_path(kind, d, args.root)):,} bytes")
+
+if __name__ == "__main__":
+    main()
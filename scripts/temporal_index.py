@@ -0,0 +1,103 @@
+import pandas as pd, numpy as np, os, argparse
+from detect_changes import CHANGE_COLS
+
+# Point-in-time lookups over the change log. Every (CIN, field) gets a sorted run
+# of change dates; a value is valid from its change date until the next one.
+# Lookups are binary searches over flat sorted arrays, so no historical
+# snapshot has to be read.
+
+PRESENT = "__present__"
+SEP = "\x1f"
+DAY = np.timedelta64(1, "D")
+
+class TemporalIndex:
+    def __init__(self, keys, dates, old, new):
+        self.keys, self.dates, self.old, self.new = keys, dates, old, new
+        self.ukeys, self.starts = np.unique(keys, return_index=True) if len(keys) else (keys, np.empty(0, dtype=int))
+        self.kid = np.repeat(np.arange(len(self.ukeys)), np.diff(np.r_[self.starts, len(keys)]))
+        self.comp = self.kid * 1_000_000 + self._day_num(dates)
+        self.cins = set(k.split(SEP, 1)[0] for k in self.ukeys)
+
+    @staticmethod
+    def _day_num(d):
+        return (np.asarray(d, dtype="datetime64[D]") - np.datetime64("1970-01-01", "D")) // DAY
+
+    @classmethod
+    def from_change_log(cls, cl):
+        cl = cl.fillna("")
+        dates = pd.to_datetime(cl.get("Date", pd.Series(dtype=str)), errors="coerce")
+        cl = cl.assign(_d=dates)[dates.notna()]
+        upd = cl[cl["Change_Type"] == "Field_Update"]
+        parts = [pd.DataFrame({"key": upd["CIN"] + SEP + upd["Field_Changed"], "date": upd["_d"],
+                               "old": upd["Old_Value"], "new": upd["New_Value"]})]
+        for ctype, old, new in (("New_Incorporation", "0", "1"), ("Removed", "1", "0")):
+            sub = cl[cl["Change_Type"] == ctype]
+            parts.append(pd.DataFrame({"key": sub["CIN"] + SEP + PRESENT, "date": sub["_d"], "old": old, "new": new}))
+        iv = pd.concat(parts, ignore_index=True).sort_values(["key", "date"], kind="stable")
+        return cls(iv["key"].to_numpy(dtype=object), iv["date"].to_numpy(dtype="datetime64[D]"),
+                   iv["old"].to_numpy(dtype=object), iv["new"].to_numpy(dtype=object))
+
+    @classmethod
+    def from_csv(cls, path):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return cls.from_change_log(pd.DataFrame(columns=CHANGE_COLS))
+        return cls.from_change_log(pd.read_csv(path, dtype=str, low_memory=False))
+
+    def lookup(self, cins, field, day):
+        # Returns (found, value) arrays; found=False means no recorded change,
+        # so the current value still holds.
+        q = np.asarray(pd.Series(cins, dtype=object).fillna("") + SEP + field, dtype=object)
+        if not len(self.ukeys):
+            return np.zeros(len(q), dtype=bool), np.full(len(q), None, dtype=object)
+        k = np.searchsorted(self.ukeys, q).clip(max=len(self.ukeys) - 1)
+        found = self.ukeys[k] == q
+        pos = np.searchsorted(self.comp, k * 1_000_000 + self._day_num(np.datetime64(day, "D")), side="right") - 1
+        before = pos < self.starts[k]
+        val = np.where(before, self.old[self.starts[k]], self.new[pos.clip(min=0)])
+        return found, np.where(found, val, None)
+
+    def value_as_of(self, cin, field, day, current=None):
+        found, val = self.lookup([cin], field, day)
+        return val[0] if found[0] else current
+
+    def resolve_frame(self, df, day, fields):
+        # Rewrites `fields` to their values on `day` and drops companies that did
+        # not exist yet (or had been removed) on that date.
+        if df.empty or "CIN" not in df.columns:
+            return df
+        hit = df["CIN"].isin(self.cins).to_numpy()
+        if not hit.any():
+            return df
+        df = df.copy()
+        cins = df.loc[hit, "CIN"]
+        for f in fields:
+            if f not in df.columns:
+                continue
+            found, val = self.lookup(cins, f, day)
+            if not found.any():
+                continue
+            if not pd.api.types.is_string_dtype(df[f]):
+                df[f] = df[f].astype(object)
+            idx = cins.index[found]
+            df.loc[idx, f] = val[found]
+        found, present = self.lookup(cins, PRESENT, day)
+        gone = cins.index[found & (present == "0")]
+        return df.drop(index=gone)
+
+    def resolve_row(self, row, day, fields):
+        out = self.resolve_frame(pd.DataFrame([row]), day, fields)
+        return {} if out.empty else out.iloc[0].to_dict()
+
+def main():
+    from detect_changes import FIELDS_TO_COMPARE
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--changes", default="outputs/daily_change_log_all.csv")
+    ap.add_argument("--cin", required=True)
+    ap.add_argument("--as-of", required=True)
+    args = ap.parse_args()
+    idx = TemporalIndex.from_csv(args.changes)
+    for f in FIELDS_TO_COMPARE + [PRESENT]:
+        print(f"{f}: {idx.value_as_of(args.cin, f, args.as_of, '(unchanged)')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import pandas as pd, numpy as np, os, json, time, argparse
+from datastore import write_csv_atomic
+
+# One columnar pass over the merged master: every rule is a boolean mask
+# computed over whole columns, rows failing any rule go to the quarantine file
+# with their reason codes, and the rows that pass leave with canonical values
+# (canonical CIN, digits-only capitals, ISO dates) that later stages can parse
+# without errors="coerce". CINs are checked and deduplicated in canonical form
+# (separators dropped, LLPINs as AAA-1234), so "U 12345-MH..." and the bare
+# CIN are one company; the spelling a row was filed with is kept in
+# CIN_AsFiled.
+
+QUARANTINE = "outputs/quarantine.csv"
+REPORT = "outputs/validation_report.json"
+
+CIN_RE = r"[LU]\d{5}[A-Z]{2}\d{4}[A-Z]{3}\d{6}"
+LLPIN_RE = r"[A-Z]{3}\d{4}"
+CAPITAL_COLS = ["AuthorizedCapital", "PaidUpCapital"]
+NUMBER_RE = r"\d+(\.\d+)?"
+# (shape, rewrite to year-month-day, has month name): each date is routed by
+# its shape, rewritten and parsed by the fast ISO 8601 parser; whatever
+# matches no shape gets a last ISO 8601 attempt (timestamps, etc.).
+DATE_SHAPES = [
+    (r"\d{4}-\d{2}-\d{2}", None, False),
+    (r"(\d{1,2})-(\d{1,2})-(\d{4})", r"\3-\2-\1", False),
+    (r"(\d{1,2})/(\d{1,2})/(\d{4})", r"\3-\2-\1", False),
+    (r"(\d{4})/(\d{1,2})/(\d{1,2})", r"\1-\2-\3", False),
+    (r"(\d{1,2})-([A-Za-z]{3})-(\d{4})", r"\3-\2-\1", True),
+    (r"(\d{1,2}) ([A-Za-z]{3}) (\d{4})", r"\3-\2-\1", True),
+]
+MONTHS = {m: f"{i:02d}" for i, m in enumerate(
+    ["jan","feb","mar","apr","may","jun","jul","aug","sep","oct","nov","dec"], 1)}
+EARLIEST = pd.Timestamp("1850-01-01")
+
+RULES = {
+    "missing_cin": "CIN is empty",
+    "bad_cin": "CIN is neither a 21-character CIN nor an LLPIN",
+    "missing_name": "CompanyName is empty",
+    "bad_authorized_capital": "AuthorizedCapital is not a non-negative number",
+    "bad_paidup_capital": "PaidUpCapital is not a non-negative number",
+    "bad_incorporation_date": "IncorporationDate cannot be parsed",
+    "date_out_of_range": "IncorporationDate is before 1850 or in the future",
+    "duplicate_cin": "CIN already seen in an earlier valid row",
+}
+
+def _text(df, col):
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=str)
+    return df[col].fillna("").astype(str).str.strip()
+
+def canonical_cin(cin):
+    # Takes trimmed upper-case text and returns the bare 21-character CIN or
+    # the AAA-1234 LLPIN, or "" when the value is neither. Only values with
+    # separators pay for the regex replace, and only values of the right
+    # length reach the full-match regexes.
+    odd = ~cin.str.isalnum() & cin.ne("")
+    key = cin.where(~odd, cin[odd].str.replace(r"[^0-9A-Z]", "", regex=True)) if odd.any() else cin
+    n = key.str.len().to_numpy()
+    is_cin, is_llp = n == 21, n == 7
+    is_cin[is_cin] = key[is_cin].str.fullmatch(CIN_RE).to_numpy(dtype=bool)
+    is_llp[is_llp] = key[is_llp].str.fullmatch(LLPIN_RE).to_numpy(dtype=bool)
+    out = key.where(is_cin, "")
+    if is_llp.any():
+        llp = key[is_llp]
+        out = out.mask(is_llp, llp.str.slice(0, 3) + "-" + llp.str.slice(3))
+    return out
+
+def parse_dates(s):
+    # Each value is parsed once. Shapes are only tested on values no earlier
+    # shape claimed, so a file in one format costs one regex pass, one rewrite
+    # and one ISO parse; strptime with a non-ISO format is several times slower.
+    out = np.full(len(s), np.datetime64("NaT"), dtype="datetime64[ns]")
+    todo = s.ne("").to_numpy(dtype=bool, copy=True)
+    for shape, rewrite, month_name in DATE_SHAPES + [(None, None, False)]:
+        if not todo.any():
+            break
+        hit = todo.copy()
+        if shape is not None:
+            hit[todo] = s[todo].str.fullmatch(shape).to_numpy(dtype=bool)
+            if not hit.any():
+                continue
+        iso = s[hit]
+        if rewrite:
+            iso = iso.str.replace(f"^{shape}$", rewrite, regex=True)
+        if month_name:
+            iso = iso.str.slice(0, 5) + iso.str.slice(5, 8).str.lower().map(MONTHS) + iso.str.slice(8)
+        out[hit] = pd.to_datetime(iso, format="ISO8601", errors="coerce").to_numpy(dtype="datetime64[ns]")
+        todo &= ~hit
+    return pd.Series(out, index=s.index)
+
+def iso_dates(d):
+    # Arrow's date-to-string cast is several times faster than dt.strftime.
+    import pyarrow as pa
+    text = pa.array(d.to_numpy(dtype="datetime64[D]")).cast(pa.string())
+    return pd.Series(pd.array(text, dtype="str"), index=d.index).fillna("")
+
+def validate(df):
+    # Returns (clean, quarantined, counts); quarantined keeps the original
+    # values plus a pipe-separated Reason column.
+    filed = _text(df, "CIN")
+    cin = canonical_cin(filed.str.upper())
+    name = _text(df, "CompanyName")
+    masks = {
+        "missing_cin": filed.eq(""),
+        "bad_cin": filed.ne("") & cin.eq(""),
+        "missing_name": name.eq(""),
+    }
+    caps = {}
+    for col, code in zip(CAPITAL_COLS, ["bad_authorized_capital", "bad_paidup_capital"]):
+        raw = _text(df, col).str.replace(",", "", regex=False)
+        masks[code] = raw.ne("") & ~raw.str.fullmatch(NUMBER_RE)
+        caps[col] = raw
+    raw_date = _text(df, "IncorporationDate")
+    dates = parse_dates(raw_date)
+    masks["bad_incorporation_date"] = raw_date.ne("") & dates.isna()
+    masks["date_out_of_range"] = (dates < EARLIEST) | (dates > pd.Timestamp.now())
+
+    bad = np.logical_or.reduce([m.to_numpy(dtype=bool) for m in masks.values()])
+    dup = np.zeros(len(df), dtype=bool)
+    dup[~bad] = cin[~bad].duplicated().to_numpy()
+    masks["duplicate_cin"] = pd.Series(dup, index=df.index)
+    bad |= dup
+
+    # Failed rules are packed into one bit per rule, so reason strings are
+    # built once per distinct combination rather than once per row.
+    codes = list(masks)
+    bits = np.zeros(int(bad.sum()), dtype=np.int64)
+    for i, code in enumerate(codes):
+        bits |= masks[code].to_numpy(dtype=bool)[bad].astype(np.int64) << i
+    combos, inv = np.unique(bits, return_inverse=True)
+    labels = np.array(["|".join(c for i, c in enumerate(codes) if b >> i & 1) for b in combos], dtype=object)
+    rejected = df[bad].copy()
+    rejected["Reason"] = labels[inv]
+
+    keep = ~bad
+    clean = df[keep].copy()
+    clean["CIN"] = cin[keep]
+    clean["CIN_AsFiled"] = filed[keep]
+    clean["CompanyName"] = name[keep]
+    for col, raw in caps.items():
+        if col in clean.columns:
+            clean[col] = raw[keep]
+    if "IncorporationDate" in clean.columns:
+        clean["IncorporationDate"] = iso_dates(dates[keep])
+    counts = {code: int(m.sum()) for code, m in masks.items()}
+    return clean.reset_index(drop=True), rejected, counts
+
+def write_outputs(rejected, counts, rows_in, seconds):
+    os.makedirs("outputs", exist_ok=True)
+    write_csv_atomic(rejected, QUARANTINE)
+    report = {
+        "validated_at": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "rows_in": rows_in,
+        "rows_clean": rows_in - len(rejected),
+        "rows_quarantined": len(rejected),
+        "rules": {code: {"count": counts.get(code, 0), "description": desc} for code, desc in RULES.items()},
+        "seconds": round(seconds, 3),
+    }
+    tmp = REPORT + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, REPORT)
+    return report
+
+def run(df):
+    started = time.perf_counter()
+    clean, rejected, counts = validate(df)
+    report = write_outputs(rejected, counts, len(df), time.perf_counter() - started)
+    print(f"Validated {len(df):,} rows: {len(clean):,} clean, {len(rejected):,} quarantined "
+          f"-> {QUARANTINE}")
+    return clean, report
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("path", nargs="?", default="outputs/mca_master.csv", help="CSV to check")
+    args = ap.parse_args()
+    df = pd.read_csv(args.path, dtype=str, low_memory=False)
+    started = time.perf_counter()
+    clean, rejected, counts = validate(df)
+    took = time.perf_counter() - started
+    for code, n in counts.items():
+        print(f"{code:<24}{n:>10,}")
+    print(f"{len(df):,} rows in {took:.2f}s ({len(df) / max(took, 1e-9):,.0f} rows/s), "
+          f"{len(rejected):,} would be quarantined")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os, sys
+
+# The pipeline modules live in scripts/ and import each other by bare name.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
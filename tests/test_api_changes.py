@@ -0,0 +1,40 @@
+import json, os
+import pytest
+import api_flask
+
+LOG = "outputs/daily_change_log_all.csv"
+HEADER = "CIN,Change_Type,Field_Changed,Old_Value,New_Value,Date\n"
+
+def write(cins, day="2025-10-15"):
+    with open(LOG, "w") as f:
+        f.write(HEADER + "".join(f"{c},New_Incorporation,,,,{day}\n" for c in cins))
+    st = os.stat(LOG)
+    os.utime(LOG, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("outputs")
+    return api_flask.app.test_client()
+
+def feed(client, since=""):
+    r = client.get(f"/changes?since={since}")
+    return [json.loads(line) for line in r.data.decode().splitlines()], r.headers.get("X-Cursor-Reset")
+
+def test_cursor_resumes_after_an_append(client):
+    write(["A", "B", "C", "D"])
+    rows, _ = feed(client)
+    write(["A", "B", "C", "D", "E"])
+    rows, reset = feed(client, rows[-1]["Cursor"])
+    assert [r["CIN"] for r in rows] == ["E"] and reset is None
+
+def test_cursor_from_before_a_rewrite_restarts(client):
+    write(["A", "B", "C", "D"])
+    rows, _ = feed(client)
+    write(["C", "D", "E", "F"], "2025-10-16")
+    rows, reset = feed(client, rows[-1]["Cursor"])
+    assert [r["CIN"] for r in rows] == ["C", "D", "E", "F"] and reset == "1"
+
+def test_malformed_cursor_is_rejected(client):
+    write(["A"])
+    assert client.get("/changes?since=4.xyz").status_code == 400
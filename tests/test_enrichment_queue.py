@@ -0,0 +1,79 @@
+import os, sys
+import pandas as pd
+import pytest
+from enrichment_queue import EnrichmentQueue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import run_all
+
+LOG = "outputs/daily_change_log_all.csv"
+HEADER = "CIN,Change_Type,Field_Changed,Old_Value,New_Value,Date\n"
+
+def row(cin, day):
+    return f"{cin},New_Incorporation,,,,{day}\n"
+
+def write(text, mode="w"):
+    with open(LOG, mode) as f:
+        f.write(text)
+    st = os.stat(LOG)
+    os.utime(LOG, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))   # mtime moves even within one tick
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("outputs")
+    return EnrichmentQueue()
+
+def test_appended_rows_are_read_once(queue):
+    write(HEADER + row("U1", "2025-10-01") + row("U2", "2025-10-01"))
+    assert queue.read_new_changes()["CIN"].tolist() == ["U1", "U2"]
+    assert queue.read_new_changes().empty
+    write(row("U3", "2025-10-02"), "a")
+    assert queue.read_new_changes()["CIN"].tolist() == ["U3"]
+    assert queue.cursor == 3
+
+def test_rewritten_log_of_same_length_is_reread(queue):
+    write(HEADER + row("U1", "2025-10-01") + row("U2", "2025-10-01"))
+    queue.read_new_changes()
+    write(HEADER + row("U2", "2025-10-01") + row("U9", "2025-10-02"))
+    assert queue.read_new_changes()["CIN"].tolist() == ["U2", "U9"]
+    assert queue.cursor == 2
+
+def test_shorter_rewrite_is_reread(queue):
+    write(HEADER + row("U1", "2025-10-01") + row("U2", "2025-10-01"))
+    queue.read_new_changes()
+    write(HEADER + row("U7", "2025-10-03"))
+    assert queue.read_new_changes()["CIN"].tolist() == ["U7"]
+
+def test_partial_last_row_waits(queue):
+    write(HEADER + row("U1", "2025-10-01") + "U2,New_Inc")
+    assert queue.read_new_changes()["CIN"].tolist() == ["U1"]
+    write("orporation,,,,2025-10-01\n", "a")
+    assert queue.read_new_changes()["CIN"].tolist() == ["U2"]
+
+def test_cursor_survives_save_and_load(queue):
+    write(HEADER + row("U1", "2025-10-01"))
+    queue.read_new_changes()
+    queue.save()
+    q = EnrichmentQueue.load()
+    write(row("U2", "2025-10-02"), "a")
+    assert q.read_new_changes()["CIN"].tolist() == ["U2"]
+
+def test_run_all_diff_lands_in_the_log_the_queue_reads(queue):
+    write(HEADER + row("U1", "2025-10-01"))
+    queue.read_new_changes()
+    os.makedirs("data")
+    pd.DataFrame({"CIN": ["U1"], "Status": ["Active"]}).to_csv("data/snapshot_2025-10-01.csv", index=False)
+    pd.DataFrame({"CIN": ["U1", "U2"], "Status": ["Active", "Active"]}).to_csv("data/snapshot_2025-10-02.csv", index=False)
+    run_all.detect_latest()
+    assert queue.read_new_changes()["CIN"].tolist() == ["U2"]
+
+def test_rewrite_does_not_requeue_already_enriched_cins(queue):
+    d1, d2 = (str((pd.Timestamp.now() - pd.Timedelta(days=n)).date()) for n in (2, 1))
+    write(HEADER + row("U1", d1) + row("U2", d1))
+    queue.sync(pd.DataFrame(columns=["CIN"]), pd.DataFrame(columns=["CIN", "ENRICHED_AT"]))
+    queue.pop(2)
+    enriched = pd.DataFrame({"CIN": ["U1", "U2"], "ENRICHED_AT": [f"{d1}T09:00:00"] * 2})
+    write(HEADER + row("U1", d1) + row("U2", d2))
+    assert queue.sync(pd.DataFrame(columns=["CIN"]), enriched) == 1
+    assert [e["CIN"] for e in queue.peek(5)] == ["U2"]
@@ -0,0 +1,27 @@
+import io
+import pandas as pd, pyarrow as pa, pyarrow.parquet as pq
+from exporters import export_file, iter_export_frames
+
+def read(fmt, buf):
+    return pq.read_table(buf) if fmt == "Parquet" else pa.ipc.open_stream(buf).read_all()
+
+def test_object_columns_export_after_an_empty_first_frame():
+    df = pd.DataFrame({"CIN": ["U1", "U2", "U3"], "State": ["KA", None, "MH"]}, dtype=object)
+    for fmt in ("Parquet", "Arrow IPC"):
+        t = read(fmt, export_file(df, fmt, chunk_rows=2))
+        assert t.column("CIN").to_pylist() == ["U1", "U2", "U3"]
+        assert t.column("State").to_pylist() == ["KA", None, "MH"]
+
+def test_all_none_column_in_first_batch_is_written_as_string():
+    frames = [pd.DataFrame({"CIN": ["U1"], "Sector": [None]}, dtype=object),
+              pd.DataFrame({"CIN": ["U2"], "Sector": ["Manufacturing"]}, dtype=object)]
+    for fmt in ("Parquet", "Arrow IPC"):
+        t = read(fmt, io.BytesIO(b"".join(iter_export_frames(iter(frames), fmt))))
+        assert t.schema.field("Sector").type == pa.string()
+        assert t.column("Sector").to_pylist() == [None, "Manufacturing"]
+
+def test_empty_export_still_has_a_schema():
+    df = pd.DataFrame({"CIN": pd.Series(dtype=object)})
+    for fmt in ("Parquet", "Arrow IPC"):
+        t = read(fmt, export_file(df, fmt))
+        assert t.num_rows == 0 and t.schema.field("CIN").type == pa.string()
@@ -0,0 +1,48 @@
+import os
+import pandas as pd
+import pytest
+import ingest_daemon, snapshot_store
+from ingest_daemon import IngestService
+
+LOG = "outputs/daily_change_log_all.csv"
+
+def snapshot(day, status):
+    df = pd.DataFrame({"CIN": ["U1", "U2"], "CompanyName": ["Acme", "Beta"], "Status": [status, "Active"]})
+    df.to_csv(f"data/snapshot_{day}.csv", index=False)
+    return df
+
+@pytest.fixture
+def svc(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ingest_daemon, "run_stage", lambda *a: None)
+    os.makedirs("data")
+    os.makedirs("outputs")
+    return IngestService(debounce=0, backfill=True)
+
+def test_late_snapshot_rebuilds_history_and_log_in_date_order(svc):
+    snapshot("2025-10-01", "Active")
+    d3 = snapshot("2025-10-03", "Strike Off")
+    svc.tick(force=True)
+    d2 = snapshot("2025-10-02", "Dormant")
+    svc.tick(force=True)
+
+    for day, df in (("2025-10-02", d2), ("2025-10-03", d3)):
+        got = snapshot_store.reconstruct(day).sort_values("CIN").reset_index(drop=True)
+        assert got[["CIN", "Status"]].equals(df[["CIN", "Status"]])
+    log = pd.read_csv(LOG, dtype=str)
+    assert log["Date"].tolist() == sorted(log["Date"])
+    assert log[["Old_Value", "New_Value", "Date"]].values.tolist() == [
+        ["Active", "Dormant", "2025-10-02"], ["Dormant", "Strike Off", "2025-10-03"]]
+
+def test_history_beats_a_loose_csv_that_was_never_stored(svc):
+    snapshot("2025-10-01", "Active")
+    svc.tick(force=True)
+    # An older CSV copied in but never ingested is not 10-03's stored predecessor.
+    snapshot("2025-10-02", "Dormant")
+    stray = os.path.join("data", "snapshot_2025-10-02.csv")
+    st = os.stat(stray)
+    svc.done[stray] = [st.st_mtime_ns, st.st_size, ingest_daemon.file_digest(stray)]
+    snapshot("2025-10-03", "Strike Off")
+    svc.tick(force=True)
+    log = pd.read_csv(LOG, dtype=str)
+    assert log[["Old_Value", "New_Value"]].values.tolist() == [["Active", "Strike Off"]]
@@ -0,0 +1,15 @@
+import pandas as pd
+from merge_data import add_decoded_columns
+
+def test_state_uses_one_vocabulary():
+    master = pd.DataFrame({
+        "CIN": ["U72200KA2010PTC123456", "AAB-1234", "U72200KA2011PTC000001", "AAC-0001", "L17110MH1973PLC019786"],
+        "State": ["RoC-Bangalore", "RoC-Bangalore", "", "RoC-Shillong", "Maharashtra"],
+    })
+    out = add_decoded_columns(master)
+    assert out["State"].tolist() == ["Karnataka", "Karnataka", "Karnataka", "Meghalaya", "Maharashtra"]
+    assert out["ROC"].tolist() == ["RoC-Bangalore", "RoC-Bangalore", "", "RoC-Shillong", ""]
+
+def test_unknown_registrar_without_cin_state_is_left_blank():
+    out = add_decoded_columns(pd.DataFrame({"CIN": ["AAD-0002"], "State": ["RoC-Nowhere"]}))
+    assert out["State"].tolist() == [""] and out["ROC"].tolist() == ["RoC-Nowhere"]
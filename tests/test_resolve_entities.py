@@ -0,0 +1,36 @@
+import pandas as pd
+from resolve_entities import resolve
+
+def clusters(rows):
+    df = pd.DataFrame(rows, columns=["CIN", "CompanyName", "State", "IncorporationDate"])
+    out = resolve(df)
+    return dict(zip(out["CIN"], out["ClusterID"]))
+
+def test_near_miss_names_with_distinct_cins_stay_apart():
+    rows = [(f"U72200KA2010PTC{n:06d}", f"Alpha {n} Private Limited", "RoC-Bangalore", "2010-01-01")
+            for n in (28, 280, 282, 284, 2840)]
+    c = clusters(rows)
+    assert len(set(c.values())) == len(rows)
+
+def test_similar_names_without_evidence_stay_apart():
+    c = clusters([
+        ("U72200KA2010PTC111111", "Sunrise Traders Private Limited", "RoC-Bangalore", "2010-01-01"),
+        ("U51909KA2010PTC222222", "Sunrise Trader Pvt Ltd", "RoC-Bangalore", "2010-06-01"),
+    ])
+    assert len(set(c.values())) == 2
+
+def test_reformatted_cin_and_near_identical_cin_link():
+    c = clusters([
+        ("U72200KA2010PTC123456", "Acme Traders Private Limited", "RoC-Bangalore", "2010-01-01"),
+        ("U72200-KA2010-PTC-123456", "ACME TRADERS PVT LTD", "RoC-Bangalore", "2010-01-01"),
+        ("U72200KA2010PTC123457", "Acme Traders Pvt. Ltd.", "RoC-Bangalore", "2011-03-01"),
+    ])
+    assert len(set(c.values())) == 1
+
+def test_chains_do_not_pull_in_distant_names():
+    # Each neighbour is close to the next, but the ends are not close to the root.
+    names = ["Blue River Exports", "Blue River Export", "Blue Rivers Export", "Blu Rivers Exporters"]
+    rows = [(f"U51909DL2005PTC{i:06d}", n, "RoC-Delhi", "2005-01-01") for i, n in enumerate(names)]
+    out = resolve(pd.DataFrame(rows, columns=["CIN", "CompanyName", "State", "IncorporationDate"]))
+    root = out["ClusterID"].iloc[0]
+    assert "U51909DL2005PTC000003" not in set(out.loc[out["ClusterID"] == root, "CIN"])
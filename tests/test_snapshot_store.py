@@ -0,0 +1,37 @@
+import pandas as pd
+import snapshot_store as ss
+
+def frame(status, extra=()):
+    rows = [("U1", "Acme", status), ("U2", "Beta", "Active")] + list(extra)
+    return pd.DataFrame(rows, columns=["CIN", "CompanyName", "Status"])
+
+def same(a, b):
+    key = lambda df: df.sort_values("CIN").reset_index(drop=True)[["CIN", "CompanyName", "Status"]]
+    return key(a).equals(key(b))
+
+def test_late_day_is_spliced_in_and_next_delta_rebuilt(tmp_path):
+    d1, d2, d3 = frame("Active"), frame("Dormant", [("U3", "Gamma", "Active")]), frame("Strike Off")
+    ss.put("2025-10-01", d1, tmp_path)
+    ss.put("2025-10-03", d3, tmp_path)
+    ss.put("2025-10-02", d2, tmp_path)
+    assert ss.bases(tmp_path) == ["2025-10-01"]
+    for day, df in (("2025-10-01", d1), ("2025-10-02", d2), ("2025-10-03", d3)):
+        assert same(ss.reconstruct(day, tmp_path), df)
+
+def test_day_before_history_becomes_base(tmp_path):
+    d0, d1, d2 = frame("Active"), frame("Dormant"), frame("Strike Off")
+    ss.put("2025-10-01", d1, tmp_path)
+    ss.put("2025-10-02", d2, tmp_path)
+    ss.put("2025-09-30", d0, tmp_path)
+    assert ss.bases(tmp_path) == ["2025-09-30", "2025-10-01"]
+    assert same(ss.reconstruct("2025-09-30", tmp_path), d0)
+    assert same(ss.reconstruct("2025-10-02", tmp_path), d2)
+
+def test_replacing_a_day_keeps_later_days(tmp_path):
+    d1, d2, d3 = frame("Active"), frame("Dormant"), frame("Strike Off")
+    for day, df in (("2025-10-01", d1), ("2025-10-02", d2), ("2025-10-03", d3)):
+        ss.put(day, df, tmp_path)
+    fixed = frame("Under Liquidation")
+    ss.put("2025-10-02", fixed, tmp_path)
+    assert same(ss.reconstruct("2025-10-02", tmp_path), fixed)
+    assert same(ss.reconstruct("2025-10-03", tmp_path), d3)
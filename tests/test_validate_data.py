@@ -0,0 +1,26 @@
+import pandas as pd
+from validate_data import canonical_cin, parse_dates, validate
+from merge_data import decode_cin
+
+def test_cins_are_canonical_and_deduplicated_in_that_form():
+    df = pd.DataFrame({"CIN": ["U72200KA2010PTC123456", " u72200-ka2010-ptc-123456", "U72201 KA2010 PTC123456",
+                               "aab 1234", "U72200KA2010PTC12345", "X-1"],
+                       "CompanyName": "Acme Traders"})
+    clean, rejected, counts = validate(df)
+    assert clean["CIN"].tolist() == ["U72200KA2010PTC123456", "U72201KA2010PTC123456", "AAB-1234"]
+    assert clean["CIN_AsFiled"].tolist() == ["U72200KA2010PTC123456", "U72201 KA2010 PTC123456", "aab 1234"]
+    assert rejected["Reason"].tolist() == ["duplicate_cin", "bad_cin", "bad_cin"]
+    assert canonical_cin(clean["CIN"]).tolist() == clean["CIN"].tolist()
+
+def test_dates_in_every_supported_shape_parse_once():
+    raw = pd.Series(["2010-01-05", "5-1-2010", "05/01/2010", "2010/1/5", "05-Jan-2010", "5 jan 2010",
+                     "2010-01-05 00:00:00", "31-02-2010", "05-Foo-2010", ""])
+    got = parse_dates(raw)
+    assert got[:7].eq(pd.Timestamp("2010-01-05")).all()
+    assert got[7:].isna().all()
+
+def test_decode_uses_canonical_cin():
+    dec = decode_cin(pd.DataFrame({"CIN": ["U72200-KA2010-PTC-123456", "AAB 1234"]}))
+    assert dec["EntityType"].tolist() == ["Company", "LLP"]
+    assert dec["CIN_StateCode"].tolist() == ["KA", ""]
+    assert dec["RegistrationNo"].tolist() == ["123456", ""]